@@ -1,12 +1,63 @@
+import multiprocessing
+import os
+import threading
 from flask import Flask
 from flask_cors import CORS
 from routes import register_routes  # Ensure this file exists and contains `register_bp`
+from routes.recognize import ensure_reports, warm_marked_cache
+from utils.metrics import init_app as init_metrics
+from utils.traffic_capture import init_app as init_traffic_capture
+from utils.admission import init_app as init_admission
+from utils.inference_pool import get_inference_pool
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
+# Request latency metrics and optional Server-Timing header
+init_metrics(app)
+
+# Record /recognize and /register payloads when ATTENAI_CAPTURE_DIR is set
+init_traffic_capture(app)
+
+# Bound concurrent /recognize and /register work; excess requests get 429 + Retry-After
+init_admission(app)
+
 # Register all routes
 register_routes(app)
 
+_services_started = False
+_services_lock = threading.Lock()
+
+
+def start_services():
+    """
+    Start inference workers and warm caches, once, in the serving process. Not run on import:
+    spawned inference workers re-import this module and must not start pools of their own.
+    """
+    global _services_started
+    with _services_lock:  # Requests arriving meanwhile wait until the caches are warm
+        if _services_started or multiprocessing.parent_process() is not None:
+            return
+
+        # Start inference workers (ATTENAI_INFERENCE_WORKERS) so their models are warm for the first frame
+        get_inference_pool()
+
+        # Students already marked present today skip straight past recognition checks
+        warm_marked_cache()
+
+        # Attendance reports are served from in-memory aggregates, rebuilt from the ledger in the background
+        threading.Thread(target=ensure_reports, name="reports-rebuild", daemon=True).start()
+
+        _services_started = True
+
+
+@app.before_request
+def _start_services_on_first_request():
+    start_services()
+
+
 if __name__ == '__main__':
+    # With the debug reloader, only the serving child (not the file watcher) starts the workers
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_services()
     app.run(debug=True)
@@ -1,11 +1,17 @@
 from .video_feed import video_feed_bp
 from .register import register_bp
 from .recognize import recognize_bp
+from .metrics import metrics_bp
+from .reports import reports_bp
+from .attendance import attendance_bp
 
 def register_routes(app):
     """Register all route blueprints."""
     app.register_blueprint(video_feed_bp, url_prefix="/video")
     app.register_blueprint(register_bp, url_prefix="/register")  # Ensure this is registered
     app.register_blueprint(recognize_bp, url_prefix="/recognize")
+    app.register_blueprint(metrics_bp, url_prefix="/metrics")
+    app.register_blueprint(reports_bp, url_prefix="/reports")
+    app.register_blueprint(attendance_bp, url_prefix="/attendance")
 
 
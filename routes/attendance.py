@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+import re
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from routes.recognize import ATTENDANCE_CSV
+from utils.ledger_index import LedgerIndex
+from utils.logger import get_logger
+from utils.metrics import counter
+
+attendance_bp = Blueprint('attendance', __name__)
+logger = get_logger(__name__)
+
+LEDGER_INDEX = LedgerIndex(ATTENDANCE_CSV)
+EXPORT_FIELDS = ["uid", "name", "module", "status", "timeRecorded"]
+EXPORT_CHUNK_BYTES = 64 * 1024  # Rows are sent in chunks of about this size
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+EXPORTED_ROWS = counter("attenai_export_rows_total", "Attendance rows streamed by /attendance/export.", ("format",))
+
+
+def encode_csv(row):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue()
+
+
+def encode_ndjson(row):
+    return json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + "\n"
+
+
+def export_chunks(rows, export_format):
+    """Encode rows and group them into chunks so each write to the client is reasonably sized."""
+    encode = encode_csv if export_format == "csv" else encode_ndjson
+    parts, size, count = [], 0, 0
+    if export_format == "csv":
+        parts.append(encode_csv(EXPORT_FIELDS))
+    for row in rows:
+        line = encode(row[:5])
+        parts.append(line)
+        size += len(line)
+        count += 1
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts)
+    EXPORTED_ROWS.inc(count, format=export_format)
+    logger.info("📤 Exported %d attendance rows as %s", count, export_format)
+
+
+@attendance_bp.route('/export', methods=['GET'])
+def export_attendance():
+    """Stream attendance records as CSV or NDJSON: ?module=BB1&from=2025-02-01&to=2025-02-28&format=ndjson"""
+    module = request.args.get("module")
+    start_date = request.args.get("from")
+    end_date = request.args.get("to")
+    export_format = request.args.get("format", "csv").lower()
+
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"message": f"Unsupported format: {export_format}. Use csv or ndjson."}), 400
+    for value in (start_date, end_date):
+        if value is not None and not re.fullmatch(r"\d{4}-\d{2}-\d{2}", value):
+            return jsonify({"message": f"Invalid date: {value}. Use YYYY-MM-DD."}), 400
+
+    rows = LEDGER_INDEX.rows(start_date, end_date, module)
+    filename = f"attendance.{export_format}"
+    return Response(
+        stream_with_context(export_chunks(rows, export_format)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
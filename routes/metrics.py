@@ -0,0 +1,10 @@
+from flask import Blueprint, Response
+from utils.metrics import render_latest
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('', methods=['GET'])
+def metrics():
+    """Expose process metrics in the Prometheus text format."""
+    return Response(render_latest(), mimetype="text/plain; version=0.0.4")
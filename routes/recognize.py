@@ -1,18 +1,30 @@
 from flask import Blueprint, jsonify, request
-import base64
-import cv2
 import csv
 import os
-import numpy as np
-from utils.image_utils import detect_faces
-from utils.model_utils import load_recognizer
+from utils.image_utils import decode_image, detect_faces
+from utils.frame_quality import check_frame
+from utils.model_utils import MODEL_PATH, load_model_profile, load_recognizer
+from utils.inference_pool import get_inference_pool
 from utils.firebase_config import db
+from utils.metrics import timed, counter
+from utils.logger import get_logger
+from utils.roster import get_roster
+from utils.response_cache import KeyReusedError, ResponseCache, payload_key
+from utils.attendance_cache import MARKED_CACHE, rebuild_from_ledger
+from utils.attendance_reports import REPORTS
 from datetime import datetime, timedelta
 import pytz
 
 recognize_bp = Blueprint('recognize', __name__, url_prefix="/recognize")
+logger = get_logger(__name__)
 
-
+ATTENDANCE_WRITES = counter(
+    "attenai_attendance_records_total", "Attendance records written.", ("status", "store")
+)
+RECOGNITION_RESULTS = counter(
+    "attenai_recognition_results_total", "Outcome of each recognized face in /recognize.", ("result",)
+)
+RECOGNITION_CACHE = ResponseCache("recognize")
 
 ATTENDANCE_CSV = "Attendance.csv"  # File path for attendance records
 
@@ -21,19 +33,8 @@ if not os.path.exists(ATTENDANCE_CSV):
     with open(ATTENDANCE_CSV, "w", newline="") as file:
         writer = csv.writer(file)
         writer.writerow(["uid", "name", "module", "status", "timeRecorded"])  # ✅ Add CSV headers
-    print("✅ Created Attendance.csv with headers.")
-
+    logger.info("✅ Created Attendance.csv with headers.")
 
-def decode_image(image_data):
-    """Convert base64-encoded image to OpenCV format."""
-    try:
-        image_bytes = base64.b64decode(image_data.split(",")[1])
-        np_arr = np.frombuffer(image_bytes, dtype=np.uint8)
-        img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-        return img
-    except Exception as e:
-        print(f"❌ Error decoding image: {e}")
-        return None
 
 def get_current_time():
     """Get the current time in a readable format (UTC+5:45 for Nepal)."""
@@ -42,19 +43,26 @@ def get_current_time():
 
 def is_within_schedule(uid):
     """Check if the user is allowed to mark attendance based on scheduled weekdays & time."""
+    schedule = find_schedule(uid)
+    return schedule[0] if schedule else None
+
+
+def find_schedule(uid):
+    """Return (module, start datetime) of the user's open attendance window, or None."""
 
     now = datetime.now(pytz.timezone("Asia/Kathmandu"))
     current_day = now.strftime("%A")  # ✅ Get current weekday (e.g., Monday)
     current_time = now.strftime("%H:%M")  # ✅ Get current time (24-hour format)
 
-    print(f"🔎 Checking schedule for UID: {uid} on {current_day} at {current_time}")
+    logger.debug("🔎 Checking schedule for UID: %s on %s at %s", uid, current_day, current_time, extra={"sample": "schedule_check"})
 
     schedules_ref = db.collection("schedules")
-    schedules_query = schedules_ref.stream()  # ✅ Get all schedules
+    with timed("schedule_lookup"):
+        schedules = list(schedules_ref.stream())  # ✅ Get all schedules
 
     valid_schedules = []  # ✅ List to store valid schedules
 
-    for schedule in schedules_query:
+    for schedule in schedules:
         schedule_data = schedule.to_dict()
 
         # ✅ Extract UIDs from `students` array
@@ -72,7 +80,7 @@ def is_within_schedule(uid):
         try:
             start_dt = datetime.strptime(start_time_str, "%H:%M")  # ✅ Convert from string to datetime
         except ValueError:
-            print(f"❌ Invalid time format in Firestore for {uid}: {start_time_str}")
+            logger.warning("❌ Invalid time format in Firestore for %s: %s", uid, start_time_str)
             continue  # ❌ Skip if time format is incorrect
 
         grace_period = timedelta(minutes=30)  # ✅ Allow ±30 minutes for attendance
@@ -87,22 +95,65 @@ def is_within_schedule(uid):
     if valid_schedules:
         # ✅ Sort by time and return the earliest valid schedule
         valid_schedules.sort(key=lambda x: x[1])
-        selected_module = valid_schedules[0][0]
-        print(f"✅ {uid} is within schedule for module: {selected_module}")
-        return selected_module
+        selected_module, selected_start = valid_schedules[0]
+        logger.debug("✅ %s is within schedule for module: %s", uid, selected_module, extra={"sample": "schedule_match"})
+        return selected_module, selected_start
 
-    print(f"❌ {uid} is NOT within schedule today.")
+    logger.debug("❌ %s is NOT within schedule today.", uid, extra={"sample": "schedule_miss"})
     return None  # ❌ No valid schedule found
 
 
+def warm_marked_cache():
+    """Rebuild the recently-marked cache from today's attendance ledger (run at startup)."""
+    return rebuild_from_ledger(MARKED_CACHE, ATTENDANCE_CSV, db.collection("schedules").stream())
+
+
+def rebuild_reports():
+    """Recompute the reporting aggregates from the full attendance ledger."""
+    return REPORTS.rebuild(ATTENDANCE_CSV, db.collection("schedules").stream())
+
+
+def ensure_reports():
+    """Build the reporting aggregates the first time they are needed (pandas stays off the import path)."""
+    REPORTS.ensure_built(rebuild_reports)
+
+
+def load_existing_attendance():
+    """Set of (uid, module, date) already marked present in the attendance CSV."""
+    existing_attendance = set()
+    with timed("csv_dedup"), open(ATTENDANCE_CSV, "r", newline="") as file:
+        reader = csv.reader(file)
+        next(reader, None)  # ✅ Skip the header row
+        for row in reader:
+            if len(row) >= 5 and row[3] == "Present":
+                existing_attendance.add((row[0], row[2], row[4][:10]))  # (uid, module, date)
+    return existing_attendance
+
+
+def get_user_name(uid):
+    """Resolve a user's name from the roster index, falling back to the Firestore schedules."""
+    user_name = get_roster().get_name(uid)
+    if user_name:
+        return user_name
+
+    for schedule in db.collection("schedules").get():  # ✅ Not registered locally, scan schedules
+        schedule_data = schedule.to_dict()
+        for student in schedule_data.get("students", []):
+            if isinstance(student, dict) and student.get("uid") == uid:
+                logger.debug("✅ Found Name for UID %s: %s", uid, student.get("name", "Unknown"))
+                return student.get("name", "Unknown")
+    return "Unknown"
+
+
 def mark_absentees():
     """Mark scheduled users as 'Absent' if they did not attend within their schedule."""
     now = datetime.now(pytz.timezone("Asia/Kathmandu"))
     current_day = now.strftime("%A")  # ✅ Get current weekday (e.g., Monday)
 
-    print(f"🔎 Running absentee check for {current_day}...")
+    logger.info("🔎 Running absentee check for %s...", current_day)
 
-    schedules_ref = db.collection("schedules").stream()  # ✅ Fetch all schedules
+    with timed("schedule_lookup"):
+        schedules_ref = list(db.collection("schedules").stream())  # ✅ Fetch all schedules
 
     for schedule in schedules_ref:
         schedule_data = schedule.to_dict()
@@ -116,7 +167,7 @@ def mark_absentees():
         try:
             start_dt = datetime.strptime(start_time_str, "%H:%M")
         except ValueError:
-            print(f"❌ Invalid time format in Firestore for module {scheduled_module}: {start_time_str}")
+            logger.warning("❌ Invalid time format in Firestore for module %s: %s", scheduled_module, start_time_str)
             continue
 
         # ✅ Convert start time to today's datetime
@@ -127,24 +178,27 @@ def mark_absentees():
         scheduled_uids = [student.get("uid") for student in schedule_data.get("students", []) if isinstance(student, dict)]
 
         if not scheduled_uids:
-            print(f"⚠️ No students scheduled for {scheduled_module}. Skipping.")
+            logger.info("⚠️ No students scheduled for %s. Skipping.", scheduled_module)
             continue  
 
         # ✅ Query Firestore for already marked attendance
         attendance_ref = db.collection("AttendanceRecords")
-        attendance_today = attendance_ref \
-            .where("module", "==", scheduled_module) \
-            .where("timeRecorded", ">=", start_dt) \
-            .where("timeRecorded", "<=", end_dt) \
-            .stream()
+        with timed("firestore_query"):
+            attendance_today = attendance_ref \
+                .where("module", "==", scheduled_module) \
+                .where("timeRecorded", ">=", start_dt) \
+                .where("timeRecorded", "<=", end_dt) \
+                .stream()
 
-        attended_uids = {record.to_dict().get("uid") for record in attendance_today}
+            attended_uids = {record.to_dict().get("uid") for record in attendance_today}
 
         # ✅ Identify absentees
         absentees = [uid for uid in scheduled_uids if uid not in attended_uids]
 
         if absentees:
-            print(f"🚨 Marking {len(absentees)} attendees as ABSENT for {scheduled_module}")
+            logger.info("🚨 Marking %d attendees as ABSENT for %s", len(absentees), scheduled_module)
+            # ✅ Ledger rows use the server's local clock; absences are dated at the window close
+            recorded_str = end_dt.astimezone(None).strftime("%Y-%m-%d %H:%M:%S")
 
             for uid in absentees:
                 try:
@@ -163,141 +217,202 @@ def mark_absentees():
                         "status": "Absent",
                         "timeRecorded": now  # ✅ Firestore timestamp
                     }
-                    attendance_ref.add(new_absent_record)  # ✅ Save to Firestore
+                    with timed("firestore_write"):
+                        attendance_ref.add(new_absent_record)  # ✅ Save to Firestore
+                    ATTENDANCE_WRITES.inc(status="Absent", store="firestore")
 
-                    print(f"❌ {uid} marked as ABSENT for {scheduled_module}")
+                    # ✅ Keep the ledger complete so reports can be rebuilt from it
+                    with timed("csv_write"), open(ATTENDANCE_CSV, "a", newline="") as file:
+                        csv.writer(file).writerow([uid, user_name, scheduled_module, "Absent", recorded_str])
+                    ATTENDANCE_WRITES.inc(status="Absent", store="csv")
+                    REPORTS.record(uid, user_name, scheduled_module, "Absent", end_dt, start_dt)
 
-                except Exception as e:
-                    print(f"❌ Error marking {uid} as absent: {e}")
-
-    print("✅ Absentee marking process completed.")
+                    logger.info("❌ %s marked as ABSENT for %s", uid, scheduled_module)
 
+                except Exception as e:
+                    logger.error("❌ Error marking %s as absent: %s", uid, e)
+
+    logger.info("✅ Absentee marking process completed.")
+
+
+@recognize_bp.route('/pool', methods=['GET'])
+def inference_pool_stats():
+    """Health and latency of the inference worker pool."""
+    pool = get_inference_pool()
+    if pool is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **pool.stats()})
+
+
+def process_recognition(image_data):
+    """Run recognition on one base64 frame and mark attendance. Returns (response_body, status)."""
+    pool = get_inference_pool()
+    if pool is None:
+        with timed("model_load"):
+            recognizer, profile = load_recognizer(), load_model_profile()
+    else:
+        recognizer = pool if os.path.exists(MODEL_PATH) else None  # ✅ Workers hold warmed models
+    if recognizer is None:
+        logger.error("❌ Face recognition model not loaded. Train the model first.")
+        return {"message": "Model not loaded. Train first."}, 500
+
+    frame = decode_image(image_data)
+    if frame is None:
+        logger.warning("❌ Failed to decode image from base64.")
+        return {"message": "Failed to process image"}, 400
+
+    # ✅ Reject hopeless frames (blurry, dark, overexposed) before detection
+    quality = check_frame(frame, "recognize")
+    if quality is not None and not quality.proceed:
+        return {"message": "Frame quality too low", "quality": quality.to_dict()}, 200
+
+    logger.debug("🔍 Detecting faces...")
+    if pool is None:
+        recognized_users, frame_with_boxes = detect_faces(frame, recognizer, profile=profile)
+    else:
+        recognized_users = pool.recognize(frame)
+
+    if not recognized_users:
+        logger.debug("⚠️ No recognizable faces detected in the frame.", extra={"sample": "no_faces"})
+        return {"message": "No recognizable faces detected"}, 200
+
+    attendance_marked = []
+    now = datetime.now()
+    today_str = now.strftime("%Y-%m-%d %H:%M:%S")
+    today_date = now.strftime("%Y-%m-%d")  # ✅ Extract today's date
+
+    existing_attendance = None  # ✅ Loaded from CSV only if a face gets past the marked cache
+
+    for user in recognized_users:
+        uid = user["uid"]
+        confidence = user["confidence"]
+
+        logger.debug("🆔 Detected UID: %s with confidence: %s", uid, confidence, extra={"sample": "face_detected"})
+
+        # ✅ Skip unknown users
+        if confidence > 1000 or uid == "Unknown":
+            logger.debug("❌ Skipping unknown user with UID: %s", uid, extra={"sample": "face_unknown"})
+            RECOGNITION_RESULTS.inc(result="unknown")
+            continue  
 
-@recognize_bp.route('', methods=['POST'])
-def recognize_user():
-    """Recognize faces, log attendance in CSV, and store in Firestore without duplicates."""
-    try:
-        print("📥 Received request for face recognition.")
-
-        data = request.json
-        image_data = data.get("image")
-
-        if not image_data:
-            print("❌ No image received in request.")
-            return jsonify({"message": "No image received"}), 400
-
-        recognizer = load_recognizer()
-        if recognizer is None:
-            print("❌ Face recognition model not loaded. Train the model first.")
-            return jsonify({"message": "Model not loaded. Train first."}), 500
-
-        frame = decode_image(image_data)
-        if frame is None:
-            print("❌ Failed to decode image from base64.")
-            return jsonify({"message": "Failed to process image"}), 400
-
-        print("🔍 Detecting faces...")
-        recognized_users, frame_with_boxes = detect_faces(frame, recognizer)
-
-        if not recognized_users:
-            print("⚠️ No recognizable faces detected in the frame.")
-            return jsonify({"message": "No recognizable faces detected"}), 200
+        # ✅ Already marked present in an open session: nothing else to check
+        if MARKED_CACHE.active_module(uid):
+            RECOGNITION_RESULTS.inc(result="debounced")
+            continue
 
-        attendance_marked = []
-        now = datetime.now()
-        today_str = now.strftime("%Y-%m-%d %H:%M:%S")
-        today_date = now.strftime("%Y-%m-%d")  # ✅ Extract today's date
+        # ✅ Check if user has a valid schedule for today
+        schedule = find_schedule(uid)
+        if not schedule:
+            logger.info("❌ Attendance rejected for UID %s. No valid schedule found.", uid, extra={"sample": "attendance_rejected"})
+            RECOGNITION_RESULTS.inc(result="out_of_schedule")
+            continue  
+        module_name, session_start = schedule
+        session_end = session_start + timedelta(minutes=30)
 
         # ✅ Step 1: Load existing attendance records from CSV (Prevents duplicate writes)
-        existing_attendance = set()
-        with open(ATTENDANCE_CSV, "r", newline="") as file:
-            reader = csv.reader(file)
-            next(reader, None)  # ✅ Skip the header row
-            for row in reader:
-                if len(row) >= 5:
-                    existing_attendance.add((row[0], row[2], row[4][:10]))  # (uid, module, date)
-
-        for user in recognized_users:
-            uid = user["uid"]
-            confidence = user["confidence"]
-
-            print(f"🆔 Detected UID: {uid} with confidence: {confidence}")
-
-            # ✅ Skip unknown users
-            if confidence > 1000 or uid == "Unknown":
-                print(f"❌ Skipping unknown user with UID: {uid}")
-                continue  
-
-            # ✅ Check if user has a valid schedule for today
-            module_name = is_within_schedule(uid)
-            if not module_name:
-                print(f"❌ Attendance rejected for UID {uid}. No valid schedule found.")
-                continue  
-
-            # ✅ Step 2: Check if user is already marked present in CSV
-            if (uid, module_name, today_date) in existing_attendance:
-                print(f"✅ {uid} already marked present today in module {module_name}. Skipping duplicate entry.")
-                continue  # ❌ Skip writing duplicate entry
-
-            # ✅ Step 3: Retrieve user name (🔥 FIXED)
-            user_name = "Unknown"
-            schedule_ref = db.collection("schedules").get()  # ✅ Get all schedules
-
-            for schedule in schedule_ref:
-                schedule_data = schedule.to_dict()
-                for student in schedule_data.get("students", []):
-                    if isinstance(student, dict) and student.get("uid") == uid:
-                        user_name = student.get("name", "Unknown")
-                        print(f"✅ Found Name for UID {uid}: {user_name}")  # Debugging Log
-                        break  # Stop searching after finding the user
-
-            # ✅ Step 4: Log attendance in CSV
-            with open(ATTENDANCE_CSV, "a", newline="") as file:
-                writer = csv.writer(file)
-                writer.writerow([uid, user_name, module_name, "Present", today_str])
-
-            print(f"✅ Attendance recorded successfully for UID {uid} in module {module_name} at {today_str}")
-
-            # ✅ Step 5: Prevent duplicate attendance in Firestore
-            start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_of_day = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-            attendance_ref = db.collection("AttendanceRecords")
+        if existing_attendance is None:
+            existing_attendance = load_existing_attendance()
+
+        # ✅ Step 2: Check if user is already marked present in CSV
+        if (uid, module_name, today_date) in existing_attendance:
+            logger.debug("✅ %s already marked present today in module %s. Skipping duplicate entry.", uid, module_name, extra={"sample": "attendance_duplicate"})
+            RECOGNITION_RESULTS.inc(result="duplicate")
+            MARKED_CACHE.mark(uid, module_name, today_date, session_end)
+            continue  # ❌ Skip writing duplicate entry
+
+        # ✅ Step 3: Retrieve user name
+        with timed("name_lookup"):
+            user_name = get_user_name(uid)
+
+        # ✅ Step 4: Log attendance in CSV
+        with timed("csv_write"), open(ATTENDANCE_CSV, "a", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow([uid, user_name, module_name, "Present", today_str])
+        ATTENDANCE_WRITES.inc(status="Present", store="csv")
+        existing_attendance.add((uid, module_name, today_date))
+        MARKED_CACHE.mark(uid, module_name, today_date, session_end)
+        REPORTS.record(uid, user_name, module_name, "Present", now, session_start)
+
+        logger.info("✅ Attendance recorded successfully for UID %s in module %s at %s", uid, module_name, today_str)
+
+        # ✅ Step 5: Prevent duplicate attendance in Firestore
+        start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_of_day = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+        attendance_ref = db.collection("AttendanceRecords")
+        with timed("firestore_query"):
             existing_records = attendance_ref \
                 .where("uid", "==", uid) \
                 .where("module", "==", module_name) \
                 .where("timeRecorded", ">=", start_of_day) \
                 .where("timeRecorded", "<=", end_of_day) \
                 .stream()
-
-            if any(existing_records):  # ✅ If attendance already exists, SKIP saving
-                print(f"✅ Attendance already exists in Firestore for UID {uid} in module {module_name}. Skipping duplicate entry.")
-            else:
-                try:
-                    new_record = {
-                        "uid": uid,
-                        "module": module_name,
-                        "name": user_name,
-                        "status": "Present",
-                        "timeRecorded": now  # ✅ Store as Firestore timestamp
-                    }
+            already_recorded = any(existing_records)
+
+        if already_recorded:  # ✅ If attendance already exists, SKIP saving
+            logger.debug("✅ Attendance already exists in Firestore for UID %s in module %s. Skipping duplicate entry.", uid, module_name)
+        else:
+            try:
+                new_record = {
+                    "uid": uid,
+                    "module": module_name,
+                    "name": user_name,
+                    "status": "Present",
+                    "timeRecorded": now  # ✅ Store as Firestore timestamp
+                }
+                with timed("firestore_write"):
                     attendance_ref.add(new_record)  # ✅ Save to Firestore
-                    print(f"✅ Attendance successfully saved in Firestore for UID {uid}")
+                ATTENDANCE_WRITES.inc(status="Present", store="firestore")
+                logger.info("✅ Attendance successfully saved in Firestore for UID %s", uid)
 
-                except Exception as e:
-                    print(f"❌ Firestore Error for UID {uid}: {e}")
+            except Exception as e:
+                logger.error("❌ Firestore Error for UID %s: %s", uid, e)
+
+        attendance_marked.append({"uid": uid, "module": module_name, "time": today_str})
+        RECOGNITION_RESULTS.inc(result="marked")
+
+    logger.debug("✅ Recognition process completed successfully.")
+
+    if not attendance_marked:
+        return {"message": "No attendance marked", "recognized_users": recognized_users}, 200
 
-            attendance_marked.append({"uid": uid, "module": module_name, "time": today_str})
+    return {"recognized_users": recognized_users, "attendance_marked": attendance_marked}, 200
+
+
+@recognize_bp.route('', methods=['POST'])
+def recognize_user():
+    """Recognize faces, log attendance in CSV, and store in Firestore without duplicates."""
+    try:
+        logger.debug("📥 Received request for face recognition.")
 
-        print("✅ Recognition process completed successfully.")
+        with timed("json_parse"):
+            data = request.json
+        image_data = data.get("image")
 
-        if not attendance_marked:
-            return jsonify({"message": "No attendance marked", "recognized_users": recognized_users}), 200
+        if not image_data:
+            logger.warning("❌ No image received in request.")
+            return jsonify({"message": "No image received"}), 400
 
-        return jsonify({"recognized_users": recognized_users, "attendance_marked": attendance_marked})
+        # ✅ Retried uploads (same frame or same Idempotency-Key) are answered from the cache
+        idempotency_key = request.headers.get("Idempotency-Key")
+        image_hash = payload_key(image_data)
+        cache_key = f"key:{idempotency_key}" if idempotency_key else f"sha:{image_hash}"
+        try:
+            (body, status), cache_hit = RECOGNITION_CACHE.get_or_compute(
+                cache_key, lambda: process_recognition(image_data), cacheable=lambda result: result[1] < 300,
+                fingerprint=image_hash if idempotency_key else None,
+            )
+        except KeyReusedError:
+            logger.warning("❌ Idempotency-Key %s reused with a different image", idempotency_key)
+            return jsonify({"message": "Idempotency-Key was already used with a different image"}), 422
+
+        response = jsonify(body)
+        if cache_hit:
+            response.headers["Idempotent-Replayed"] = "true"
+        return response, status
 
     except Exception as e:
-        print(f"❌ ERROR in recognize_user: {str(e)}")
+        logger.exception("❌ ERROR in recognize_user: %s", e)
         return jsonify({"message": "Internal Server Error", "error": str(e)}), 500   
 
 
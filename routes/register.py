@@ -1,10 +1,13 @@
 from flask import Blueprint, request, jsonify
 import os
 from utils.file_utils import create_directories, save_user_to_csv
-from utils.image_utils import crop_and_save_faces
+from utils.image_utils import crop_and_save_faces, decode_image
+from utils.enrollment_sessions import SessionError, get_enrollment_sessions
 from utils.model_utils import train_recognizer
+from utils.logger import get_logger
 
 register_bp = Blueprint('register', __name__, url_prefix="/register")
+logger = get_logger(__name__)
 
 
 @register_bp.route('', methods=['POST'])
@@ -23,17 +26,24 @@ def register_user():
 
         save_user_to_csv(user_id, name)
 
-        saved_count = crop_and_save_faces(user_id, name, images)
+        saved_count, dropped_count = crop_and_save_faces(user_id, name, images)
 
         if saved_count < 10:
+            if dropped_count:
+                return jsonify({"message": "Not enough distinct face images. Move your head slightly between captures.",
+                                "saved": saved_count, "duplicates_dropped": dropped_count}), 400
             return jsonify({"message": "Face detection failed. Ensure proper lighting and face visibility."}), 400
 
         train_recognizer()
 
-        return jsonify({"message": f"{saved_count} images processed, user saved, and model trained!"})
+        return jsonify({
+            "message": f"{saved_count} images processed, user saved, and model trained!",
+            "saved": saved_count,
+            "duplicates_dropped": dropped_count,
+        })
 
     except Exception as e:
-        print("Error in register_user:", str(e))
+        logger.exception("Error in register_user: %s", e)
         return jsonify({"message": "Internal Server Error", "error": str(e)}), 500  
 
 
@@ -60,16 +70,129 @@ def retrain_user():
 
         create_directories()
 
-        saved_count = crop_and_save_faces(user_id, user_id, images, retrain=True)
+        saved_count, dropped_count = crop_and_save_faces(user_id, user_id, images, retrain=True)
 
         if saved_count < 10:
+            if dropped_count:
+                return jsonify({"message": "Not enough distinct face images. Move your head slightly between captures.",
+                                "saved": saved_count, "duplicates_dropped": dropped_count}), 400
             return jsonify({"message": "Face detection failed. Ensure proper lighting and face visibility."}), 400
 
         # ✅ Retrain Model with new data
         train_recognizer()
 
-        return jsonify({"message": f"Retraining complete! {saved_count} new images added."})
+        return jsonify({
+            "message": f"Retraining complete! {saved_count} new images added.",
+            "saved": saved_count,
+            "duplicates_dropped": dropped_count,
+        })
 
     except Exception as e:
-        print("Error in retrain_user:", str(e))  
-        return jsonify({"message": "Internal Server Error", "error": str(e)}), 500    
+        logger.exception("Error in retrain_user: %s", e)
+        return jsonify({"message": "Internal Server Error", "error": str(e)}), 500
+
+
+def _finish_session(state):
+    """Register the user (unless retraining) and train on the session's crops."""
+    if not state["retrain"]:
+        save_user_to_csv(state["uid"], state["name"])
+    train_recognizer()
+    saved_count = len(state["saved_paths"])
+    message = (f"Retraining complete! {saved_count} new images added." if state["retrain"]
+               else f"{saved_count} images processed, user saved, and model trained!")
+    return {"message": message, "saved": saved_count, "duplicates_dropped": state["dropped"]}
+
+
+def _session_or_404(session_id):
+    session = get_enrollment_sessions().get(session_id)
+    if session is None:
+        return None, (jsonify({"message": "Unknown or expired enrollment session."}), 404)
+    return session, None
+
+
+@register_bp.route('/sessions', methods=['POST'])
+def open_session():
+    """Start a streamed enrollment: frames are then pushed one by one to /sessions/<id>/frames."""
+    data = request.get_json(silent=True) or {}
+    user_id = str(data.get('id') or data.get('uid') or '')
+    retrain = bool(data.get('retrain'))
+    name = data.get('name') or (user_id if retrain else None)
+
+    if not user_id or not name:
+        return jsonify({"message": "ID and name are required."}), 400
+    if os.path.basename(user_id) != user_id or user_id.startswith('.'):
+        return jsonify({"message": "Invalid ID."}), 400
+
+    create_directories()
+    session = get_enrollment_sessions().open(user_id, name, retrain=retrain)
+    return jsonify(session.progress()), 201
+
+
+@register_bp.route('/sessions/<session_id>', methods=['GET'])
+def session_progress(session_id):
+    """Progress of a session; after a dropped connection, resume pushing from `next_seq`."""
+    session, error = _session_or_404(session_id)
+    if error:
+        return error
+    return jsonify(session.progress())
+
+
+@register_bp.route('/sessions/<session_id>/frames', methods=['POST'])
+def push_frame(session_id):
+    """
+    Add one frame: JSON `{"seq": n, "image": "data:image/jpeg;base64,..."}`, or the raw
+    JPEG/PNG bytes with `?seq=n`. Faces are cropped and saved before the response.
+    """
+    session, error = _session_or_404(session_id)
+    if error:
+        return error
+
+    try:
+        if request.is_json:
+            data = request.get_json(silent=True) or {}
+            seq, img_data = data.get('seq'), data.get('image')
+            if not img_data:
+                return jsonify({"message": "image is required."}), 400
+        else:
+            seq = request.args.get('seq')
+            img_data = request.get_data()
+            if not img_data:
+                return jsonify({"message": "Frame body is required."}), 400
+        seq = int(seq) if seq is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"message": "Invalid seq."}), 400
+    img = decode_image(img_data)  # None (undecodable) still counts as a frame of the session
+
+    try:
+        return jsonify(get_enrollment_sessions().push(session, seq, img))
+    except SessionError as e:
+        return jsonify({"message": str(e), **session.progress()}), e.status
+    except Exception as e:
+        logger.exception("Error in push_frame: %s", e)
+        return jsonify({"message": "Internal Server Error", "error": str(e)}), 500
+
+
+@register_bp.route('/sessions/<session_id>/close', methods=['POST'])
+def close_session(session_id):
+    """Finish enrollment and train; safe to retry."""
+    session, error = _session_or_404(session_id)
+    if error:
+        return error
+
+    try:
+        return jsonify(get_enrollment_sessions().close(session, _finish_session))
+    except SessionError as e:
+        return jsonify({"message": str(e), **session.progress()}), e.status
+    except Exception as e:
+        logger.exception("Error in close_session: %s", e)
+        return jsonify({"message": "Internal Server Error", "error": str(e)}), 500
+
+
+@register_bp.route('/sessions/<session_id>', methods=['DELETE'])
+def abort_session(session_id):
+    """Abandon a session and delete the crops it saved."""
+    session, error = _session_or_404(session_id)
+    if error:
+        return error
+    get_enrollment_sessions().abort(session)
+    return jsonify({"message": "Enrollment session discarded."})
@@ -0,0 +1,56 @@
+import time
+from flask import Blueprint, jsonify, request
+from routes.recognize import ensure_reports, rebuild_reports
+from utils.attendance_reports import REPORTS
+from utils.logger import get_logger
+
+reports_bp = Blueprint('reports', __name__)
+logger = get_logger(__name__)
+
+
+@reports_bp.before_request
+def _build_reports():
+    """The first report request waits for the initial rebuild (usually already done in the background)."""
+    if request.endpoint != "reports.rebuild":
+        ensure_reports()
+
+
+@reports_bp.route('/modules', methods=['GET'])
+def module_summary():
+    """Present/late/absent totals and attendance rate per module."""
+    return jsonify({"modules": REPORTS.modules()})
+
+
+@reports_bp.route('/modules/<module>/daily', methods=['GET'])
+def module_daily(module):
+    """Per-day counts for a module, optionally ?from=YYYY-MM-DD&to=YYYY-MM-DD."""
+    if module not in REPORTS:
+        return jsonify({"message": f"No attendance recorded for module {module}"}), 404
+    days = REPORTS.daily(module, request.args.get("from"), request.args.get("to"))
+    return jsonify({"module": module, "days": days})
+
+
+@reports_bp.route('/modules/<module>/students', methods=['GET'])
+def module_students(module):
+    """Per-student counts for a module."""
+    if module not in REPORTS:
+        return jsonify({"message": f"No attendance recorded for module {module}"}), 404
+    return jsonify({"module": module, "students": REPORTS.students(module)})
+
+
+@reports_bp.route('/students/<uid>', methods=['GET'])
+def student_summary(uid):
+    """Per-module counts for one student."""
+    return jsonify(REPORTS.student(uid))
+
+
+@reports_bp.route('/rebuild', methods=['POST'])
+def rebuild():
+    """Recompute all aggregates from the attendance ledger."""
+    try:
+        start = time.perf_counter()
+        records = rebuild_reports()
+        return jsonify({"records": records, "seconds": round(time.perf_counter() - start, 3)})
+    except Exception as e:
+        logger.exception("❌ Error rebuilding attendance reports: %s", e)
+        return jsonify({"message": "Failed to rebuild reports", "error": str(e)}), 500
@@ -1,13 +1,11 @@
-from flask import Blueprint, Response
-import cv2
-from utils.image_utils import draw_faces
+from flask import Blueprint, Response, jsonify, request
+from utils.camera_stream import AdaptiveRate, CAMERAS, DEFAULT_FPS, DEFAULT_QUALITY, get_camera, mjpeg_frames
 from utils.firebase_config import db
 from datetime import datetime
 import pytz
 
 video_feed_bp = Blueprint('video_feed', __name__)
 
-camera = cv2.VideoCapture(0)
 
 def is_schedule_available():
     """Check if there is a scheduled attendance session for the current time."""
@@ -30,24 +28,34 @@ def is_schedule_available():
     return False  # ❌ No schedule found, do not start camera
 
 
+def stream_settings():
+    """Per-client caps from the query string: ?fps=10&width=640&quality=60&adaptive=0"""
+    return AdaptiveRate(
+        max_fps=request.args.get("fps", DEFAULT_FPS, type=int),
+        max_width=request.args.get("width", type=int),
+        max_quality=request.args.get("quality", DEFAULT_QUALITY, type=int),
+        adaptive=request.args.get("adaptive", "1") != "0",
+    )
+
+
 @video_feed_bp.route('/live')
-def live_feed():
+@video_feed_bp.route('/live/<camera_id>')
+def live_feed(camera_id=None):
     """Stream live video feed with face detection, only if a schedule exists."""
+    camera = get_camera(camera_id)
+    if camera is None:
+        return Response(f"Unknown camera: {camera_id}", status=404)
+
     if not is_schedule_available():
         return Response("No scheduled attendance session.", status=403)
 
-    def generate():
-        while True:
-            success, frame = camera.read()
-            if not success:
-                break
-            frame = draw_faces(frame)  # Detect faces
-            _, buffer = cv2.imencode('.jpg', frame)
-            frame = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-
-    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(mjpeg_frames(camera, stream_settings()), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+@video_feed_bp.route('/cameras')
+def camera_stats():
+    """Per-camera capture/detection fps and dropped frames."""
+    return jsonify({"cameras": [camera.stats() for camera in CAMERAS.values()]})
 
 
 
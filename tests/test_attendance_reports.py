@@ -0,0 +1,28 @@
+import threading
+from datetime import datetime
+
+from utils import attendance_reports
+from utils.attendance_reports import AttendanceAggregates
+
+
+def test_record_during_rebuild_is_kept(tmp_path, monkeypatch):
+    reading, recorded = threading.Event(), threading.Event()
+    read_ledger = attendance_reports.ledger_outcomes
+
+    def slow_ledger_outcomes(pd, ledger_path, schedules):
+        outcomes = read_ledger(pd, ledger_path, schedules)
+        reading.set()
+        recorded.wait(timeout=5)  # The record lands after the ledger was read, before it is folded in
+        return outcomes
+
+    monkeypatch.setattr(attendance_reports, "ledger_outcomes", slow_ledger_outcomes)
+    reports = AttendanceAggregates()
+    rebuild = threading.Thread(target=reports.rebuild, args=(str(tmp_path / "Attendance.csv"), []))
+    rebuild.start()
+    reading.wait(timeout=5)
+    reports.record("42", "Ann", "CS101", "Present", datetime.now().astimezone())
+    recorded.set()
+    rebuild.join()
+
+    assert reports.modules()["CS101"]["present"] == 1
+    assert reports.students("CS101")["42"]["name"] == "Ann"
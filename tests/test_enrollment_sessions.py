@@ -0,0 +1,70 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from utils import enrollment_sessions
+from utils.enrollment_sessions import EnrollmentSessions, SessionError
+from utils.model_utils import training_image_paths
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    training_dir = tmp_path / "TrainingImage"
+    training_dir.mkdir()
+    monkeypatch.setattr(enrollment_sessions, "TRAINING_DIR", str(training_dir))
+    # One distinct random "face" per frame, instead of running the detector
+    rng = np.random.default_rng(0)
+    monkeypatch.setattr(enrollment_sessions, "enrollment_faces",
+                        lambda img: [rng.integers(0, 256, (64, 64), dtype=np.uint8)])
+    return EnrollmentSessions(directory=str(tmp_path / "EnrollmentSessions"), ttl=60)
+
+
+def _push_frames(sessions, session, count):
+    for seq in range(count):
+        sessions.push(session, seq, np.zeros((8, 8, 3), np.uint8))
+
+
+def test_open_session_is_not_trained_on(sessions):
+    session = sessions.open("3003", "Pending", min_faces=3)
+    _push_frames(sessions, session, 3)
+    assert training_image_paths(enrollment_sessions.TRAINING_DIR) == []
+
+    sessions.close(session, lambda state: {"saved": len(state["saved_paths"])})
+    assert {uid for _, uid in training_image_paths(enrollment_sessions.TRAINING_DIR)} == {3003}
+    assert not os.path.exists(session.pending_folder)
+
+
+def test_push_after_abort_is_rejected(sessions):
+    session = sessions.open("3003", "Pending", min_faces=3)
+    _push_frames(sessions, session, 2)
+    sessions.abort(session)
+
+    with pytest.raises(SessionError):
+        sessions.push(session, 2, np.zeros((8, 8, 3), np.uint8))
+    with pytest.raises(SessionError):
+        sessions.close(session, lambda state: {})
+    assert not os.path.exists(sessions._path(session.session_id))
+    assert not os.path.exists(session.pending_folder)
+
+
+def test_idle_session_expires_on_get(sessions):
+    session = sessions.open("3003", "Pending")
+    _push_frames(sessions, session, 1)
+    session.state["updated_at"] = time.time() - 120
+
+    assert sessions.get(session.session_id) is None
+    assert not os.path.exists(session.pending_folder)
+
+
+def test_get_rereads_state_written_by_another_process(sessions):
+    session = sessions.open("3003", "Pending")
+    other = EnrollmentSessions(directory=sessions.directory, ttl=sessions.ttl)
+    _push_frames(other, other.get(session.session_id), 2)
+
+    assert sessions.get(session.session_id).state["next_seq"] == 2
+
+    other.abort(other.get(session.session_id))
+    assert sessions.get(session.session_id) is None
+
@@ -0,0 +1,50 @@
+import cv2
+import numpy as np
+
+from utils.model_utils import chi_square_distances, create_recognizer, get_profile, k_medoids, select_prototypes
+
+
+def _faces(count, seed=0, size=64):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (size, size), dtype=np.uint8) for _ in range(count)]
+
+
+def _recognizer(faces, labels):
+    recognizer = create_recognizer(get_profile("compact"))
+    recognizer.train(faces, np.array(labels))
+    return recognizer
+
+
+def test_k_medoids_returns_k_distinct_indices():
+    histograms = np.random.default_rng(1).random((30, 16)).astype(np.float32)
+    medoids = k_medoids(chi_square_distances(histograms), 5)
+    assert len(medoids) == len(set(medoids)) == 5
+
+
+def test_k_medoids_with_zero_distances_picks_distinct_samples():
+    # Near-duplicates the distance can't tell apart must still give k separate medoids
+    medoids = k_medoids(np.zeros((10, 10)), 4)
+    assert len(set(medoids)) == 4
+
+
+def test_user_with_identical_images_keeps_one_prototype():
+    face = _faces(1)[0]
+    recognizer = _recognizer([face.copy() for _ in range(12)], [7] * 12)
+    assert select_prototypes(recognizer, 4) == [0]
+
+
+def test_duplicates_do_not_take_prototype_slots():
+    distinct = _faces(6, seed=2)
+    faces = distinct + [distinct[0].copy() for _ in range(10)]
+    recognizer = _recognizer(faces, [3] * len(faces))
+    keep = select_prototypes(recognizer, 4)
+    assert len(keep) == 4
+    assert len({cv2.norm(faces[i]) for i in keep}) == 4  # Four different images, not copies
+
+
+def test_prototypes_are_selected_per_user():
+    faces = _faces(20, seed=3)
+    recognizer = _recognizer(faces, [1] * 10 + [2] * 10)
+    labels = recognizer.getLabels().ravel()
+    keep = select_prototypes(recognizer, 3)
+    assert sorted(labels[keep].tolist()) == [1, 1, 1, 2, 2, 2]
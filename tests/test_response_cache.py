@@ -0,0 +1,36 @@
+import threading
+import time
+
+from utils.response_cache import ResponseCache
+
+
+def _compute_concurrently(cache, count=5):
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return "ok"
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("frame", compute)))
+               for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(calls), results
+
+
+def test_concurrent_identical_requests_are_computed_once():
+    calls, results = _compute_concurrently(ResponseCache("test", ttl=60))
+    assert calls == 1
+    assert sum(hit for _, hit in results) == 4
+
+
+def test_zero_ttl_disables_cache_and_coalescing():
+    cache = ResponseCache("test", ttl=0)
+    calls, results = _compute_concurrently(cache)
+    assert calls == 5
+    assert not any(hit for _, hit in results)
+    assert len(cache) == 0
@@ -0,0 +1,110 @@
+"""
+Compare face detector engines on the bundled training images.
+
+Every training image holds exactly one face, so recall is the share of images
+with at least one detection. Crops are padded with a border first (--pad) so the
+face does not fill the whole frame, as it would in a camera shot:
+
+    python -m tools.benchmark_detectors --images TrainingImage --detectors haar yunet --haar-scales 1.05 1.1 1.2
+
+YuNet needs its ONNX model at models/face_detection_yunet_2023mar.onnx (or ATTENAI_YUNET_MODEL);
+fetch it first with `python -m tools.fetch_yunet_model --commit ... --sha256 ...`. Without it the run stops instead of
+reporting Haar alone, unless --skip-unavailable is given.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.face_detectors import DETECTORS, HaarDetector  # noqa: E402
+
+
+def load_images(directory, pad, limit=None):
+    """Training images as BGR frames with a `pad` (fraction of the size) border around each crop."""
+    paths = sorted(glob.glob(os.path.join(directory, "**", "*.jpg"), recursive=True))[:limit]
+    images = []
+    for path in paths:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+        border = int(max(image.shape[:2]) * pad)
+        images.append(cv2.copyMakeBorder(image, border, border, border, border, cv2.BORDER_CONSTANT, value=(0, 0, 0)))
+    return paths, images
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def benchmark(detector, images, repeat=1, min_size=40):
+    """Per-frame latency (on the detector's preferred input) and recall over `images`."""
+    inputs = [image if detector.color else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) for image in images]
+    detector.detect(inputs[0], min_size=min_size)  # Warm up
+    latencies, found = [], 0
+    for round_index in range(repeat):
+        for image in inputs:
+            start = time.perf_counter()
+            faces = detector.detect(image, min_size=min_size)
+            latencies.append(time.perf_counter() - start)
+            if round_index == 0 and len(faces) > 0:
+                found += 1
+    latencies.sort()
+    return {
+        "frames": len(inputs),
+        "recall": round(found / len(inputs), 4) if inputs else None,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default="TrainingImage", help="Directory of training images")
+    parser.add_argument("--detectors", nargs="+", default=list(DETECTORS), choices=list(DETECTORS))
+    parser.add_argument("--haar-scales", nargs="*", type=float, default=[], help="Extra Haar runs at these scale factors")
+    parser.add_argument("--pad", type=float, default=0.5, help="Border added around each crop, as a fraction of its size")
+    parser.add_argument("--min-size", type=int, default=40, help="Smallest face size in pixels")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing rounds over the image set")
+    parser.add_argument("--limit", type=int, default=None, help="Use at most this many images")
+    parser.add_argument("--skip-unavailable", action="store_true", help="Report engines that can't load instead of stopping")
+    args = parser.parse_args(argv)
+
+    paths, images = load_images(args.images, args.pad, args.limit)
+    if not images:
+        print(f"No images found in {args.images}.")
+        return 1
+
+    candidates = []
+    for name in args.detectors:
+        candidates.append((name, lambda name=name: DETECTORS[name]()))
+    for scale in args.haar_scales:
+        candidates.append((f"haar@{scale}", lambda scale=scale: HaarDetector(scale_factor=scale)))
+
+    cv2.setNumThreads(1)  # Per-frame latency on one core, as in a request or worker thread
+    results = {}
+    for label, factory in candidates:
+        try:
+            detector = factory()
+        except (RuntimeError, FileNotFoundError, cv2.error) as e:
+            if not args.skip_unavailable:
+                print(f"Cannot benchmark {label}: {e}", file=sys.stderr)
+                return 2
+            results[label] = {"error": str(e)}
+            continue
+        results[label] = benchmark(detector, images, args.repeat, args.min_size)
+
+    print(json.dumps({"images": len(images), "pad": args.pad, "results": results}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Compare face normalization profiles (LBPH input size, radius/neighbors, grid) on TrainingImage/.
+
+Every --holdout'th crop of each user is held out; each profile is trained on the rest
+and reports, for the held-out crops:
+  - accuracy: predicted the right user within the profile's threshold
+  - genuine distance percentiles and the threshold that would accept as many held-out
+    crops as the reference profile does (to calibrate a new profile's threshold)
+  - predict latency per face (normalize + predict), training time and model file size
+  - false accepts when each user is left out of training (needs at least two users)
+
+With --prototypes the reference profile is also compacted to k medoid histograms per user
+(as ATTENAI_MODEL_PROTOTYPES does after training) and compared with the uncompressed model:
+
+    python -m tools.evaluate_profiles --profiles default balanced fast compact
+    python -m tools.evaluate_profiles --profiles default --prototypes 4 8 16
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.model_utils import (  # noqa: E402
+    FACE_PROFILES, TRAINING_DIR, create_recognizer, get_profile, normalize_face, select_prototypes, training_image_paths,
+)
+
+
+def load_split(directory, holdout):
+    """(train, test) lists of (gray image, uid); every `holdout`th image of each user is a test image."""
+    train, test, seen = [], [], {}
+    for path, uid in training_image_paths(directory):
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            continue
+        seen[uid] = seen.get(uid, 0) + 1
+        (test if seen[uid] % holdout == 0 else train).append((image, uid))
+    return train, test
+
+
+def fit(profile, samples, prototypes=0):
+    recognizer = create_recognizer(profile)
+    faces = [normalize_face(image, profile) for image, _ in samples]
+    recognizer.train(faces, np.array([uid for _, uid in samples]))
+    if prototypes > 0:
+        keep = select_prototypes(recognizer, prototypes)
+        recognizer = create_recognizer(profile)
+        recognizer.train([faces[i] for i in keep], np.array([samples[i][1] for i in keep]))
+    return recognizer
+
+
+def model_size(recognizer):
+    fd, path = tempfile.mkstemp(suffix=".yml")
+    os.close(fd)
+    try:
+        recognizer.save(path)
+        return os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+
+def distances(recognizer, profile, samples):
+    """[(predicted uid, distance, seconds)] with the threshold lifted, so every distance is seen."""
+    recognizer.setThreshold(float("inf"))
+    results = []
+    for image, _ in samples:
+        start = time.perf_counter()
+        label, distance = recognizer.predict(normalize_face(image, profile))
+        results.append((label, distance, time.perf_counter() - start))
+    recognizer.setThreshold(profile["threshold"])
+    return results
+
+
+def false_accepts(profile, train, test, prototypes=0):
+    """Share of held-out crops accepted as someone else when their user is not in the model."""
+    users = sorted({uid for _, uid in train})
+    if len(users) < 2:
+        return None
+    accepted = total = 0
+    for uid in users:
+        recognizer = fit(profile, [sample for sample in train if sample[1] != uid], prototypes)
+        impostors = [sample for sample in test if sample[1] == uid]
+        accepted += sum(distance <= profile["threshold"] for _, distance, _ in distances(recognizer, profile, impostors))
+        total += len(impostors)
+    return round(accepted / total, 4) if total else None
+
+
+def evaluate(profile, train, test, prototypes=0):
+    start = time.perf_counter()
+    recognizer = fit(profile, train, prototypes)
+    train_seconds = time.perf_counter() - start
+
+    results = distances(recognizer, profile, test)
+    genuine = sorted(distance for (label, distance, _), (_, uid) in zip(results, test) if label == uid)
+    correct = sum(1 for (label, distance, _), (_, uid) in zip(results, test) if label == uid and distance <= profile["threshold"])
+    latencies = sorted(seconds for _, _, seconds in results)
+    return {
+        "profile": {key: value for key, value in profile.items() if key != "name"},
+        "accuracy": round(correct / len(test), 4),
+        "genuine_distance_p50": round(float(np.percentile(genuine, 50)), 2) if genuine else None,
+        "genuine_distance_p95": round(float(np.percentile(genuine, 95)), 2) if genuine else None,
+        "false_accept_rate": false_accepts(profile, train, test, prototypes),
+        "predict_ms_p50": round(latencies[len(latencies) // 2] * 1000, 3),
+        "predict_ms_mean": round(sum(latencies) / len(latencies) * 1000, 3),
+        "samples": len(recognizer.getHistograms()),
+        "train_s": round(train_seconds, 3),
+        "model_mb": round(model_size(recognizer) / 1e6, 2),
+        "_genuine": genuine,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=TRAINING_DIR, help="Training image directory")
+    parser.add_argument("--profiles", nargs="+", default=list(FACE_PROFILES), choices=list(FACE_PROFILES))
+    parser.add_argument("--reference", default="default", choices=list(FACE_PROFILES), help="Profile to match acceptance against")
+    parser.add_argument("--holdout", type=int, default=5, help="Hold out every Nth crop of each user")
+    parser.add_argument("--prototypes", nargs="*", type=int, default=[], help="Also compact the reference profile to k samples per user")
+    args = parser.parse_args(argv)
+
+    train, test = load_split(args.images, args.holdout)
+    if not train or not test:
+        print(f"Not enough images in {args.images}.")
+        return 1
+
+    cv2.setNumThreads(1)  # Per-face latency on one core, as in a request or worker thread
+    names = list(dict.fromkeys([args.reference] + args.profiles))
+    results = {name: evaluate(get_profile(name), train, test) for name in names}
+
+    # ✅ Threshold giving each profile the reference profile's acceptance on genuine crops
+    reference = results[args.reference]
+    accepted_share = sum(d <= reference["profile"]["threshold"] for d in reference["_genuine"]) / len(test)
+    for result in results.values():
+        genuine = result.pop("_genuine")
+        index = int(np.ceil(accepted_share * len(test))) - 1
+        result["equivalent_threshold"] = round(genuine[index], 1) if 0 <= index < len(genuine) else None
+
+    # ✅ Compacted reference models against the uncompressed one
+    compacted = {}
+    for k in args.prototypes:
+        result = evaluate(get_profile(args.reference), train, test, k)
+        result.pop("_genuine")
+        compacted[f"{args.reference}@{k}"] = result
+
+    users = len({uid for _, uid in train})
+    report = {
+        "users": users, "train_images": len(train), "test_images": len(test),
+        "results": {name: results[name] for name in args.profiles},
+    }
+    if compacted:
+        report["prototypes"] = {args.reference: reference, **compacted}
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
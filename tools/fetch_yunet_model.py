@@ -0,0 +1,104 @@
+"""
+Download the YuNet face detector model (not vendored) to models/face_detection_yunet_2023mar.onnx
+(or ATTENAI_YUNET_MODEL), verify its SHA-256 and check that OpenCV can load it:
+
+    python -m tools.fetch_yunet_model --commit <opencv_zoo commit> --sha256 <expected digest>
+
+The file is fetched from that opencv_zoo commit, never from a moving branch, and deleted
+if its digest differs. --commit and --sha256 default to YUNET_MODEL_COMMIT and
+YUNET_MODEL_SHA256 in utils/face_detectors.py once those are pinned.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import urllib.request
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.face_detectors import (  # noqa: E402
+    YUNET_MODEL_COMMIT, YUNET_MODEL_PATH, YUNET_MODEL_SHA256, YUNET_MODEL_URL, YuNetDetector
+)
+
+
+class ChecksumError(Exception):
+    """The downloaded file is not the pinned model."""
+
+
+def sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fetch(url, path, sha256, timeout=60):
+    """Download `url` to `path` atomically if its SHA-256 is `sha256`; otherwise nothing is kept."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as file, urllib.request.urlopen(url, timeout=timeout) as response:
+            for chunk in iter(lambda: response.read(64 * 1024), b""):
+                digest.update(chunk)
+                file.write(chunk)
+        if digest.hexdigest() != sha256.lower():
+            raise ChecksumError(f"SHA-256 {digest.hexdigest()} does not match the expected {sha256}")
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commit", default=YUNET_MODEL_COMMIT, help="opencv_zoo commit to download from")
+    parser.add_argument("--sha256", default=YUNET_MODEL_SHA256, help="expected SHA-256 of the model file")
+    parser.add_argument("--output", default=YUNET_MODEL_PATH)
+    parser.add_argument("--force", action="store_true", help="Download even if the file exists")
+    args = parser.parse_args(argv)
+
+    if not args.sha256:
+        print("No expected SHA-256 is pinned; pass --sha256 (and --commit).", file=sys.stderr)
+        return 1
+
+    if os.path.exists(args.output) and not args.force:
+        if sha256_of(args.output) != args.sha256.lower():
+            print(f"{args.output} does not match the expected SHA-256 (use --force to download it again).",
+                  file=sys.stderr)
+            return 1
+        print(f"{args.output} already exists and matches the expected SHA-256.")
+    else:
+        if not args.commit:
+            print("No opencv_zoo commit is pinned; pass --commit.", file=sys.stderr)
+            return 1
+        url = YUNET_MODEL_URL.format(commit=args.commit)
+        try:
+            fetch(url, args.output, args.sha256)
+        except ChecksumError as e:
+            print(f"Discarded the download from {url}: {e}", file=sys.stderr)
+            return 1
+        except OSError as e:
+            print(f"Download failed: {e}", file=sys.stderr)
+            return 1
+        print(f"Saved {args.output} ({os.path.getsize(args.output)} bytes, sha256 verified)")
+
+    # ✅ Make sure this OpenCV build can run it before pointing ATTENAI_FACE_DETECTOR at yunet
+    try:
+        detector = YuNetDetector(args.output)
+        detector.detect(np.zeros((64, 64, 3), dtype=np.uint8))
+    except (RuntimeError, FileNotFoundError, cv2.error) as e:
+        print(f"OpenCV could not load {args.output}: {e}", file=sys.stderr)
+        return 1
+    print("YuNet model loads; set ATTENAI_FACE_DETECTOR=yunet to use it.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""
+Replay captured /recognize and /register traffic against a local instance.
+
+Capture first by running the server with ATTENAI_CAPTURE_DIR=captures, then:
+
+    python -m tools.replay_traffic captures/*.jsonl --serve --speed 4 --concurrency 32
+
+`--serve` starts the app in-process on --port with the in-memory Firestore
+stand-in (ATTENAI_FIRESTORE=local), so no cameras or Firebase are needed.
+It runs in a temporary copy of TrainingImage/, StudentDetails/, TrainedModel/
+and Attendance.csv (or in --data-dir), so replayed registrations, retrains and
+attendance never touch the real data.
+The /recognize response cache is turned off there (ATTENAI_RESPONSE_CACHE_TTL=0
+unless set), so repeated frames are processed instead of replayed from the cache;
+run a --url target with the same setting.
+
+Latency is measured from each request's scheduled send time, so time spent
+waiting for a free client thread while the server is saturated counts
+(no coordinated omission). The gap between scheduled and actual send is
+reported separately as send lag, and the time from the actual send as service time.
+"""
+import argparse
+import base64
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def load_captures(paths, path_filter=None):
+    """Load captured requests from JSONL files, ordered by capture time."""
+    entries = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if path_filter and not entry["path"].startswith(path_filter):
+                    continue
+                entries.append(entry)
+    entries.sort(key=lambda e: e["ts"])
+    return entries
+
+
+def build_schedule(entries, speed=1.0, copies=1):
+    """Return (offset_seconds, entry) pairs; speed > 1 compresses time, speed 0 sends immediately."""
+    if not entries:
+        return []
+    start = entries[0]["ts"]
+    schedule = []
+    for entry in entries:
+        offset = 0.0 if speed <= 0 else (entry["ts"] - start) / speed
+        schedule.extend((offset, entry) for _ in range(copies))
+    return schedule
+
+
+def send(base_url, entry, timeout):
+    """Send one captured request; returns (path, status, service_seconds, error)."""
+    url = base_url.rstrip("/") + entry["path"]
+    if entry.get("body_encoding") == "base64":
+        body = base64.b64decode(entry["body"])
+    else:
+        body = entry["body"].encode("utf-8")
+    req = urllib.request.Request(url, data=body, method=entry.get("method", "POST"))
+    req.add_header("Content-Type", entry.get("content_type") or "application/json")
+
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            response.read()
+            status, error = response.status, None
+    except urllib.error.HTTPError as e:
+        e.read()
+        status, error = e.code, None
+    except Exception as e:
+        status, error = None, type(e).__name__
+    return entry["path"].split("?")[0], status, time.perf_counter() - start, error
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def replay(base_url, schedule, concurrency=8, timeout=30.0):
+    """
+    Drive the schedule with a bounded pool and collect per-request results:
+    (path, status, latency_seconds, error, send_lag_seconds, service_seconds), where latency
+    runs from the scheduled send time to completion.
+    """
+    results = []
+    lock = threading.Lock()
+
+    def run(entry, scheduled_at):
+        sent_at = time.perf_counter()
+        path, status, service, error = send(base_url, entry, timeout)
+        done_at = time.perf_counter()
+        with lock:
+            results.append((path, status, done_at - scheduled_at, error, sent_at - scheduled_at, service))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for offset, entry in schedule:
+            delay = offset - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, entry, started + offset)
+    elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def summarize(results, elapsed):
+    """Build a report of throughput, tail latency and error rates, overall and per path."""
+    def ms(seconds):
+        return round(seconds * 1000, 1)
+
+    def stats(rows):
+        latencies = sorted(r[2] for r in rows)
+        lags = sorted(r[4] for r in rows)
+        service = sorted(r[5] for r in rows)
+        errors = sum(1 for r in rows if r[3] is not None or (r[1] or 0) >= 500)
+        return {
+            "requests": len(rows),
+            "errors": errors,
+            "error_rate": round(errors / len(rows), 4) if rows else 0.0,
+            "p50_ms": ms(percentile(latencies, 50)),
+            "p90_ms": ms(percentile(latencies, 90)),
+            "p99_ms": ms(percentile(latencies, 99)),
+            "max_ms": ms(latencies[-1]) if latencies else 0.0,
+            "send_lag_p50_ms": ms(percentile(lags, 50)),
+            "send_lag_p99_ms": ms(percentile(lags, 99)),
+            "send_lag_max_ms": ms(lags[-1]) if lags else 0.0,
+            "service_p50_ms": ms(percentile(service, 50)),
+            "service_p99_ms": ms(percentile(service, 99)),
+        }
+
+    by_path = defaultdict(list)
+    for row in results:
+        by_path[row[0]].append(row)
+
+    report = stats(results)
+    report["elapsed_s"] = round(elapsed, 2)
+    report["throughput_rps"] = round(len(results) / elapsed, 2) if elapsed else 0.0
+    report["statuses"] = dict(Counter(str(r[1] if r[1] is not None else r[3]) for r in results))
+    report["paths"] = {path: stats(rows) for path, rows in sorted(by_path.items())}
+    return report
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATHS = ("TrainingImage", "StudentDetails", "TrainedModel", "Attendance.csv")  # Written by /register and /recognize
+RESOURCE_PATHS = ("haarcascade_frontalface_default.xml", "models")  # Only read
+
+
+def prepare_data_dir(data_dir=None):
+    """
+    Working directory for the served app: a temporary copy of the repo's data, or `data_dir`
+    (created if missing, seeded with the detector files). Never the repo itself.
+    """
+    if data_dir is None:
+        data_dir = tempfile.mkdtemp(prefix="attenai-replay-")
+        names = DATA_PATHS + RESOURCE_PATHS
+    else:
+        if os.path.realpath(data_dir) == os.path.realpath(REPO_DIR):
+            raise SystemExit("--data-dir must not be the repository: replayed traffic would overwrite its data.")
+        os.makedirs(data_dir, exist_ok=True)
+        names = RESOURCE_PATHS
+    for name in names:
+        source, target = os.path.join(REPO_DIR, name), os.path.join(data_dir, name)
+        if os.path.exists(target) or not os.path.exists(source):
+            continue
+        if os.path.isdir(source):
+            shutil.copytree(source, target)
+        else:
+            shutil.copy2(source, target)
+    return data_dir
+
+
+def serve_in_background(port, data_dir=None):
+    """Start the app on localhost with the in-memory Firestore stand-in, working in a copy of the data."""
+    os.environ["ATTENAI_FIRESTORE"] = "local"
+    os.environ.pop("ATTENAI_CAPTURE_DIR", None)
+    # Replayed and --copies duplicates must reach the pipeline, not the /recognize response cache
+    os.environ.setdefault("ATTENAI_RESPONSE_CACHE_TTL", "0")
+    sys.path.insert(0, REPO_DIR)
+    for name in ("ATTENAI_FIRESTORE_SEED", "ATTENAI_YUNET_MODEL"):  # Still relative to where the tool was started
+        if os.environ.get(name):
+            os.environ[name] = os.path.abspath(os.environ[name])
+    data_dir = prepare_data_dir(data_dir)
+    os.chdir(data_dir)  # The app reads and writes its data relative to the working directory
+    print(f"Serving from {data_dir}")
+
+    from werkzeug.serving import make_server
+    from app import app
+
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="replay-server", daemon=True).start()
+    return f"http://127.0.0.1:{port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured AttenAI traffic.")
+    parser.add_argument("captures", nargs="+", help="capture-*.jsonl files")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="target base URL")
+    parser.add_argument("--serve", action="store_true", help="start a local instance with the Firestore stand-in")
+    parser.add_argument("--port", type=int, default=5055, help="port for --serve")
+    parser.add_argument("--data-dir", help="working directory for --serve (default: a temporary copy of the data)")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression (2 = twice as fast, 0 = no pacing)")
+    parser.add_argument("--copies", type=int, default=1, help="send each captured request N times")
+    parser.add_argument("--concurrency", type=int, default=8, help="max requests in flight")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout (seconds)")
+    parser.add_argument("--path", help="only replay requests whose path starts with this")
+    args = parser.parse_args(argv)
+
+    entries = load_captures(args.captures, args.path)
+    if not entries:
+        print("No captured requests found.")
+        return 1
+
+    base_url = serve_in_background(args.port, args.data_dir) if args.serve else args.url
+    schedule = build_schedule(entries, speed=args.speed, copies=max(1, args.copies))
+    print(f"Replaying {len(schedule)} requests against {base_url} (speed x{args.speed}, concurrency {args.concurrency})")
+
+    results, elapsed = replay(base_url, schedule, args.concurrency, args.timeout)
+    print(json.dumps(summarize(results, elapsed), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from flask import g, jsonify, request
+from .inference_pool import INFERENCE_WORKERS
+from .logger import get_logger
+from .metrics import counter, gauge, histogram
+
+logger = get_logger(__name__)
+
+# Requests allowed in the recognition pipeline at once (0 disables admission control)
+ADMISSION_LIMIT = int(os.environ.get("ATTENAI_ADMISSION_LIMIT", str(max(1, INFERENCE_WORKERS or os.cpu_count() or 1))))
+ADMISSION_QUEUE = int(os.environ.get("ATTENAI_ADMISSION_QUEUE", "16"))  # Requests allowed to wait for a slot
+ADMISSION_MAX_WAIT = float(os.environ.get("ATTENAI_ADMISSION_MAX_WAIT", "2.0"))  # Seconds before giving up with 429
+
+# POST paths under admission control; lower value = served first
+ADMISSION_PRIORITIES = {"/recognize": 0, "/register": 1}
+
+ADMISSION_REQUESTS = counter(
+    "attenai_admission_requests_total", "Admission decisions for pipeline requests.", ("endpoint", "result")
+)
+ADMISSION_WAIT_SECONDS = histogram(
+    "attenai_admission_wait_seconds", "Time spent queued before admission.", ("endpoint",)
+)
+ADMISSION_IN_FLIGHT = gauge("attenai_admission_in_flight", "Requests currently in the recognition pipeline.")
+ADMISSION_QUEUE_DEPTH = gauge("attenai_admission_queue_depth", "Requests waiting for a pipeline slot.")
+
+
+class _Waiter:
+    __slots__ = ("priority", "event", "admitted", "evicted")
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.event = threading.Event()
+        self.admitted = False
+        self.evicted = False
+
+
+class AdmissionController:
+    """
+    At most `limit` requests in flight, plus a short priority queue (FIFO within a priority).
+    A freed slot is handed straight to the best waiter; when the queue is full a request
+    either displaces a lower-priority waiter or is turned away immediately.
+    """
+
+    def __init__(self, limit=ADMISSION_LIMIT, queue_size=ADMISSION_QUEUE, max_wait=ADMISSION_MAX_WAIT):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._queue = []  # heap of (priority, seq, waiter)
+        self._seq = itertools.count()
+        self._service_time = 0.2  # Moving average of seconds per request, for Retry-After
+        self._lock = threading.Lock()
+
+    def _update_gauges(self):
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        ADMISSION_QUEUE_DEPTH.set(len(self._queue))
+
+    def acquire(self, priority=0):
+        """Returns (admitted, result) where result is admitted, queued, rejected, evicted or timeout."""
+        with self._lock:
+            if self.in_flight < self.limit and not self._queue:
+                self.in_flight += 1
+                self._update_gauges()
+                return True, "admitted"
+
+            if len(self._queue) >= self.queue_size:
+                worst = max(self._queue, key=lambda entry: (entry[0], entry[1]))
+                if worst[0] <= priority:
+                    return False, "rejected"
+                # ✅ Queue full of less urgent work: take the place of the newest lowest-priority waiter
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                worst[2].evicted = True
+                worst[2].event.set()
+
+            waiter = _Waiter(priority)
+            heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+            self._update_gauges()
+
+        waiter.event.wait(self.max_wait)
+        with self._lock:
+            if waiter.admitted:
+                return True, "queued"
+            if waiter.evicted:
+                return False, "evicted"
+            self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+            heapq.heapify(self._queue)
+            self._update_gauges()
+            return False, "timeout"
+
+    def release(self, service_seconds=None):
+        """Free a slot, handing it to the best waiter if there is one."""
+        with self._lock:
+            if service_seconds is not None:
+                self._service_time = 0.9 * self._service_time + 0.1 * service_seconds
+            if self._queue:
+                _, _, waiter = heapq.heappop(self._queue)
+                waiter.admitted = True  # The slot moves to the waiter; in_flight is unchanged
+                waiter.event.set()
+            else:
+                self.in_flight -= 1
+            self._update_gauges()
+
+    def retry_after(self):
+        """Seconds a rejected client should wait: time to drain the queue at the current pace."""
+        with self._lock:
+            backlog = self.in_flight + len(self._queue)
+            return max(1, math.ceil(backlog * self._service_time / max(1, self.limit)))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "queued": len(self._queue),
+                "queue_size": self.queue_size,
+                "max_wait_s": self.max_wait,
+                "avg_service_ms": round(self._service_time * 1000, 1),
+            }
+
+
+def _admission_path(path):
+    for prefix in ADMISSION_PRIORITIES:
+        if path == prefix or path.startswith(prefix + "/"):
+            return prefix
+    return None
+
+
+def init_app(app, limit=ADMISSION_LIMIT):
+    """Apply admission control to POSTs on ADMISSION_PRIORITIES paths; returns the controller."""
+    if limit <= 0:
+        return None
+
+    controller = AdmissionController(limit)
+    logger.info("🚦 Admission control: %d in flight, %d queued, %.1fs max wait", limit, controller.queue_size, controller.max_wait)
+
+    @app.before_request
+    def _admit_request():
+        endpoint = _admission_path(request.path) if request.method == "POST" else None
+        if endpoint is None:
+            return None
+
+        wait_start = time.perf_counter()
+        admitted, result = controller.acquire(ADMISSION_PRIORITIES[endpoint])
+        ADMISSION_REQUESTS.inc(endpoint=endpoint, result=result)
+        if admitted:
+            ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - wait_start, endpoint=endpoint)
+            g.admission_started = time.perf_counter()
+            return None
+
+        # ❌ Saturated: answer now instead of letting the request (and the client's retry) pile up
+        retry_after = controller.retry_after()
+        logger.warning("🚦 %s %s rejected (%s), retry after %ds", request.method, request.path, result, retry_after,
+                       extra={"sample": "admission_rejected"})
+        response = jsonify({"message": "Server busy, retry later", "retry_after": retry_after})
+        response.status_code = 429
+        response.headers["Retry-After"] = str(retry_after)
+        return response
+
+    @app.teardown_request
+    def _release_request(exc=None):
+        started = g.pop("admission_started", None)
+        if started is not None:
+            controller.release(time.perf_counter() - started)
+
+    app.extensions["admission"] = controller
+    return controller
@@ -0,0 +1,115 @@
+import csv
+import os
+import threading
+from datetime import datetime, timedelta
+import pytz
+from .logger import get_logger
+from .metrics import counter, gauge
+
+logger = get_logger(__name__)
+
+TIMEZONE = pytz.timezone("Asia/Kathmandu")
+GRACE_PERIOD = timedelta(minutes=30)  # Attendance window is start ± 30 minutes
+
+DEBOUNCE_LOOKUPS = counter(
+    "attenai_marked_cache_lookups_total", "Recently-marked cache lookups after prediction.", ("result",)
+)
+DEBOUNCE_ENTRIES = gauge("attenai_marked_cache_entries", "Students currently cached as marked present.")
+
+
+class MarkedCache:
+    """
+    In-memory (uid, module, date) -> session end of students already marked present.
+    Consulted right after prediction so repeat frames skip schedule, CSV and Firestore checks.
+    Entries expire when the session's attendance window closes.
+    """
+
+    def __init__(self):
+        self._entries = {}  # uid -> {(module, date): expires_at}
+        self._lock = threading.Lock()
+
+    def mark(self, uid, module, date, expires_at):
+        with self._lock:
+            self._entries.setdefault(uid, {})[(module, date)] = expires_at
+            DEBOUNCE_ENTRIES.set(sum(len(v) for v in self._entries.values()))
+
+    def active_module(self, uid, now=None):
+        """Module `uid` is already marked present for in a still-open session, or None."""
+        now = now or datetime.now(TIMEZONE)
+        with self._lock:
+            sessions = self._entries.get(uid)
+            if not sessions:
+                DEBOUNCE_LOOKUPS.inc(result="miss")
+                return None
+            for key, expires_at in list(sessions.items()):
+                if expires_at <= now:
+                    del sessions[key]
+            if not sessions:
+                del self._entries[uid]
+                DEBOUNCE_LOOKUPS.inc(result="miss")
+                return None
+            DEBOUNCE_LOOKUPS.inc(result="hit")
+            return next(iter(sessions))[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            DEBOUNCE_ENTRIES.set(0)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(v) for v in self._entries.values())
+
+
+def todays_sessions(schedules, now=None):
+    """{module: [(window_start, window_end), ...]} for schedules running today."""
+    now = now or datetime.now(TIMEZONE)
+    current_day = now.strftime("%A")
+    sessions = {}
+    for schedule in schedules:
+        schedule_data = schedule.to_dict()
+        if current_day not in schedule_data.get("workingDays", []):
+            continue
+        try:
+            start = datetime.strptime(schedule_data.get("startTime", "00:00"), "%H:%M")
+        except ValueError:
+            continue
+        start_dt = now.replace(hour=start.hour, minute=start.minute, second=0, microsecond=0)
+        sessions.setdefault(schedule_data.get("module"), []).append((start_dt - GRACE_PERIOD, start_dt + GRACE_PERIOD))
+    return sessions
+
+
+def rebuild_from_ledger(cache, ledger_path, schedules, now=None):
+    """Reload today's still-open 'Present' records from the attendance CSV into the cache."""
+    now = now or datetime.now(TIMEZONE)
+    # Ledger timestamps are written with the server's local clock
+    today = now.astimezone(None).strftime("%Y-%m-%d")
+    sessions = todays_sessions(schedules, now)
+    cache.clear()
+    if not os.path.exists(ledger_path):
+        return 0
+
+    restored = 0
+    with open(ledger_path, "r", newline="") as file:
+        reader = csv.reader(file)
+        next(reader, None)  # ✅ Skip the header row
+        for row in reader:
+            if len(row) < 5 or row[3] != "Present" or row[4][:10] != today:
+                continue
+            uid, module = row[0], row[2]
+            try:
+                recorded = datetime.strptime(row[4][:19], "%Y-%m-%d %H:%M:%S").astimezone()
+            except ValueError:
+                continue
+            # ✅ Expire at the end of the session window the record falls in
+            for window_start, window_end in sessions.get(module, []):
+                if window_start <= recorded <= window_end and window_end > now:
+                    cache.mark(uid, module, today, window_end)
+                    restored += 1
+                    break
+
+    logger.info("♻️ Restored %d recently-marked students from %s", restored, ledger_path)
+    return restored
+
+
+MARKED_CACHE = MarkedCache()
@@ -0,0 +1,259 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from .attendance_cache import GRACE_PERIOD, TIMEZONE
+from .logger import get_logger
+from .metrics import gauge, timed
+
+logger = get_logger(__name__)
+
+# Present records this long after the session start count as late
+LATE_AFTER = timedelta(minutes=int(os.environ.get("ATTENAI_LATE_AFTER_MINUTES", "10")))
+
+STATUSES = ("present", "late", "absent")
+
+REPORT_RECORDS = gauge("attenai_report_records", "Attendance records folded into the reporting aggregates.")
+
+
+def _empty():
+    return {"present": 0, "late": 0, "absent": 0}
+
+
+def with_rate(counts):
+    """Counts plus total and attendance rate (present + late over all records)."""
+    total = counts["present"] + counts["late"] + counts["absent"]
+    attended = counts["present"] + counts["late"]
+    return {**counts, "total": total, "attendance_rate": round(attended / total, 4) if total else None}
+
+
+def classify(status, recorded_at, session_start=None):
+    """'present', 'late' or 'absent' for a ledger status and the matching session start."""
+    if status.lower() == "absent":
+        return "absent"
+    if session_start is not None and recorded_at - session_start > LATE_AFTER:
+        return "late"
+    return "present"
+
+
+def to_session_time(recorded_at):
+    """Attendance timestamps (naive server-local or aware) in the schedule time zone."""
+    return recorded_at.astimezone(TIMEZONE)
+
+
+class AttendanceAggregates:
+    """
+    Present / late / absent counts per module-day, per module-student and per student,
+    kept up to date as attendance is written so reports never scan the ledger.
+    Each (module, date, uid) counts once; a present record replaces an earlier absence.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.RLock()  # Serializes rebuilds (and the first build); held while pandas reads the ledger
+        self._pending = None  # Records made while a rebuild reads the ledger, re-applied once it is folded in
+        self._reset()
+
+    def _reset(self):
+        self._outcomes = {}  # (module, date, uid) -> status
+        self._by_day = {}  # module -> {date: counts}
+        self._by_student = {}  # module -> {uid: counts}
+        self._names = {}  # uid -> name
+        self.rebuilt_at = None
+
+    def _apply(self, key, status):
+        previous = self._outcomes.get(key)
+        if previous == status or (previous in ("present", "late") and status == "absent"):
+            return False
+        module, date, uid = key
+        day = self._by_day.setdefault(module, {}).setdefault(date, _empty())
+        student = self._by_student.setdefault(module, {}).setdefault(uid, _empty())
+        if previous is not None:
+            day[previous] -= 1
+            student[previous] -= 1
+        day[status] += 1
+        student[status] += 1
+        self._outcomes[key] = status
+        return True
+
+    def record(self, uid, name, module, status, recorded_at, session_start=None):
+        """Fold one attendance record in; `session_start` (if known) decides lateness and the day."""
+        recorded_at = to_session_time(recorded_at).replace(microsecond=0)  # ✅ Same precision as the ledger
+        if session_start is not None:
+            session_start = session_start.replace(microsecond=0)
+        outcome = classify(status, recorded_at, session_start)
+        key = (module, (session_start or recorded_at).strftime("%Y-%m-%d"), uid)
+        with self._lock:
+            if name and name != "Unknown":
+                self._names[uid] = name
+            changed = self._apply(key, outcome)
+            if self._pending is not None:
+                self._pending.append((key, outcome, name))
+            REPORT_RECORDS.set(len(self._outcomes))
+        return changed
+
+    def rebuild(self, ledger_path, schedules):
+        """
+        Recompute everything from the attendance CSV (vectorized); returns the number of records.
+        Records made while the ledger is read are kept aside and applied again on top of the result.
+        """
+        with self._build_lock, timed("report_rebuild"):
+            with self._lock:
+                self._pending = []
+            try:
+                import pandas as pd  # Only needed for full rebuilds
+                outcomes = ledger_outcomes(pd, ledger_path, schedules)
+            except BaseException:
+                with self._lock:
+                    self._pending = None
+                raise
+            with self._lock:
+                pending, self._pending = self._pending, None
+                self._reset()
+                for module, date, uid, status in zip(
+                    outcomes["module"], outcomes["date"], outcomes["uid"], outcomes["outcome"]
+                ):
+                    self._outcomes[(module, date, uid)] = status
+                for (module, date), counts in _count(outcomes, "date").items():
+                    self._by_day.setdefault(module, {})[date] = counts
+                for (module, uid), counts in _count(outcomes, "uid").items():
+                    self._by_student.setdefault(module, {})[uid] = counts
+                named = outcomes[outcomes["name"].notna() & (outcomes["name"] != "Unknown")]
+                self._names = dict(zip(named["uid"], named["name"]))
+                for key, outcome, name in pending:  # A no-op for records the ledger read already had
+                    if name and name != "Unknown":
+                        self._names[key[2]] = name
+                    self._apply(key, outcome)
+                self.rebuilt_at = datetime.now(TIMEZONE)
+                REPORT_RECORDS.set(len(self._outcomes))
+        logger.info("📊 Rebuilt attendance aggregates from %d records in %s", len(outcomes), ledger_path)
+        return len(outcomes)
+
+    def ensure_built(self, build):
+        """Run `build` (a full rebuild) unless the aggregates were built already; concurrent callers wait for it."""
+        with self._build_lock:
+            if self.rebuilt_at is None:
+                build()
+
+    def modules(self):
+        """Totals per module."""
+        with self._lock:
+            summary = {}
+            for module, days in self._by_day.items():
+                totals = _empty()
+                for counts in days.values():
+                    for status in STATUSES:
+                        totals[status] += counts[status]
+                summary[module] = {**with_rate(totals), "sessions": len(days), "students": len(self._by_student.get(module, {}))}
+            return summary
+
+    def daily(self, module, start=None, end=None):
+        """Counts per day of `module`, optionally limited to start <= date <= end (YYYY-MM-DD)."""
+        with self._lock:
+            days = self._by_day.get(module, {})
+            return {
+                date: with_rate(dict(counts))
+                for date, counts in sorted(days.items())
+                if (start is None or date >= start) and (end is None or date <= end)
+            }
+
+    def students(self, module):
+        """Counts per student of `module`."""
+        with self._lock:
+            return {
+                uid: {"name": self._names.get(uid, "Unknown"), **with_rate(dict(counts))}
+                for uid, counts in sorted(self._by_student.get(module, {}).items())
+            }
+
+    def student(self, uid):
+        """Counts per module for one student."""
+        with self._lock:
+            modules = {
+                module: with_rate(dict(students[uid]))
+                for module, students in sorted(self._by_student.items())
+                if uid in students
+            }
+            return {"uid": uid, "name": self._names.get(uid, "Unknown"), "modules": modules}
+
+    def __contains__(self, module):
+        with self._lock:
+            return module in self._by_day
+
+
+def schedule_starts(pd, schedules):
+    """DataFrame of (module, weekday, start_minute) for every scheduled session."""
+    rows = []
+    for schedule in schedules:
+        schedule_data = schedule.to_dict()
+        try:
+            start = datetime.strptime(schedule_data.get("startTime", "00:00"), "%H:%M")
+        except ValueError:
+            continue
+        for day in schedule_data.get("workingDays", []):
+            rows.append((schedule_data.get("module"), day, start.hour * 60 + start.minute))
+    return pd.DataFrame(rows, columns=["module", "weekday", "start_minute"])
+
+
+def ledger_outcomes(pd, ledger_path, schedules):
+    """One row per (module, date, uid) with its outcome, derived from the attendance CSV."""
+    columns = ["uid", "name", "module", "date", "outcome"]
+    if not os.path.exists(ledger_path):
+        return pd.DataFrame(columns=columns)
+
+    ledger = pd.read_csv(ledger_path, dtype=str, on_bad_lines="skip").dropna(
+        subset=["uid", "module", "status", "timeRecorded"]
+    )
+    recorded = pd.to_datetime(ledger["timeRecorded"].str[:19], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    ledger, recorded = ledger[recorded.notna()], recorded[recorded.notna()]
+
+    # Ledger timestamps use the server's local clock; sessions are defined in TIMEZONE
+    local_zone = datetime.now().astimezone().tzinfo
+    session_time = recorded.dt.tz_localize(local_zone).dt.tz_convert(TIMEZONE).dt.tz_localize(None)
+    day = session_time.dt.normalize()  # Naive session-local from here on: formatting stays vectorized
+    ledger = ledger.assign(
+        row=range(len(ledger)),
+        recorded=session_time,
+        date=day.dt.strftime("%Y-%m-%d"),
+        minute=(session_time - day).dt.total_seconds() / 60,
+    )
+
+    # ✅ Match each record to the session window it falls in (windows may cross midnight)
+    starts = schedule_starts(pd, schedules)
+    candidates = []
+    for shift in (-1, 0, 1):
+        session_day = day + pd.Timedelta(days=shift)
+        candidates.append(pd.DataFrame({
+            "row": ledger["row"].to_numpy(),
+            "module": ledger["module"].to_numpy(),
+            "weekday": session_day.dt.day_name().to_numpy(),
+            "session_date": session_day.dt.strftime("%Y-%m-%d").to_numpy(),
+            "minute": (ledger["minute"] - shift * 1440).to_numpy(),
+        }))
+    matched = pd.concat(candidates).merge(starts, on=["module", "weekday"], how="inner")
+    matched["offset"] = matched["minute"] - matched["start_minute"]
+    matched = matched[matched["offset"].abs() <= GRACE_PERIOD.total_seconds() / 60]
+    best = matched.loc[matched["offset"].abs().groupby(matched["row"]).idxmin(), ["row", "offset", "session_date"]]
+    ledger = ledger.merge(best, on="row", how="left")
+    ledger["date"] = ledger["session_date"].fillna(ledger["date"])
+
+    absent = ledger["status"].str.lower() == "absent"
+    late = ledger["offset"] > LATE_AFTER.total_seconds() / 60
+    ledger["outcome"] = "present"
+    ledger.loc[late, "outcome"] = "late"
+    ledger.loc[absent, "outcome"] = "absent"
+
+    # ✅ One outcome per (module, date, uid): the earliest attended record wins over absences
+    ledger["rank"] = absent.astype(int)
+    ledger = ledger.sort_values(["rank", "recorded"]).drop_duplicates(["module", "date", "uid"], keep="first")
+    return ledger[columns].reset_index(drop=True)
+
+
+def _count(outcomes, by):
+    """{(module, by): counts} from the outcome rows."""
+    if outcomes.empty:
+        return {}
+    table = outcomes.groupby(["module", by, "outcome"]).size().unstack(fill_value=0)
+    table = table.reindex(columns=list(STATUSES), fill_value=0)
+    return {key: {status: int(value) for status, value in zip(STATUSES, values)} for key, values in zip(table.index, table.to_numpy())}
+
+
+REPORTS = AttendanceAggregates()
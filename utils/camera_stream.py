@@ -0,0 +1,351 @@
+import os
+import threading
+import time
+from collections import deque
+import cv2
+from .image_utils import draw_faces, new_detector
+from .logger import get_logger
+from .metrics import counter, gauge, timed
+
+logger = get_logger(__name__)
+
+# Camera sources: "id=source" pairs, source is a device index, video file or RTSP/HTTP URL
+CAMERA_SOURCES = os.environ.get("ATTENAI_CAMERA_SOURCES", "0=0")
+
+# Adaptive streaming limits
+MIN_FPS = 2
+MIN_WIDTH = 160
+MIN_QUALITY = 30
+DEFAULT_FPS = 15
+DEFAULT_QUALITY = 80
+FPS_WINDOW = 30  # Frames used for the rolling fps estimate
+
+# Reopening a source that failed (RTSP drop, unplugged camera): first retry delay, doubled up to the max
+RECONNECT_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+STALL_TIMEOUT = 30.0  # A client's stream ends after this many seconds without a new frame
+
+STREAM_SUBSCRIBERS = gauge("attenai_stream_subscribers", "Clients connected to a live stream.", ("camera",))
+STREAM_FRAMES = counter(
+    "attenai_stream_frames_total", "Live stream frames by outcome.", ("camera", "result")
+)
+CAMERA_FRAMES = counter(
+    "attenai_camera_frames_total", "Camera frames captured, processed or dropped before processing.", ("camera", "stage")
+)
+CAMERA_FPS = gauge("attenai_camera_fps", "Rolling camera frame rate.", ("camera", "stage"))
+
+
+class RateMeter:
+    """Rolling frames-per-second over the last FPS_WINDOW events."""
+
+    def __init__(self, window=FPS_WINDOW):
+        self._times = deque(maxlen=window)
+
+    def tick(self):
+        self._times.append(time.monotonic())
+
+    @property
+    def fps(self):
+        if len(self._times) < 2:
+            return 0.0
+        span = self._times[-1] - self._times[0]
+        return (len(self._times) - 1) / span if span > 0 else 0.0
+
+
+class CameraStream:
+    """
+    One capture source shared by every client of a live stream.
+    A reader thread grabs frames at the source's pace and a detection thread draws face
+    boxes on the newest one, so slow detection drops stale frames instead of lagging.
+    Both only run while someone is subscribed; JPEG encodings are shared between
+    clients asking for the same size and quality. A source that fails is released and
+    reopened with backoff, and video files loop.
+    """
+
+    def __init__(self, camera_id, source):
+        self.camera_id = str(camera_id)
+        self.source = source
+        self.subscribers = 0
+        self.seq = 0
+        self.frame = None
+        self.captured = 0
+        self.processed = 0
+        self.dropped = 0
+        self._capture = None
+        self._interval = None  # Seconds per frame for video files
+        self._threads = {}  # kind -> thread
+        self._raw = None
+        self._raw_seq = 0
+        self._processed_seq = 0
+        self._capture_rate = RateMeter()
+        self._process_rate = RateMeter()
+        self._detector = None
+        self._cond = threading.Condition()
+        self._encoded = {}  # (width, quality) -> jpeg bytes for the current seq
+        self._encoded_seq = -1
+        self._resize_buffers = {}  # (width, height) -> reusable resize output
+        self._encode_lock = threading.Lock()
+
+    def subscribe(self):
+        with self._cond:
+            self.subscribers += 1
+            STREAM_SUBSCRIBERS.set(self.subscribers, camera=self.camera_id)
+            # ✅ Each loop is checked on its own, so one that died is restarted even if the other runs
+            for kind, loop in (("reader", self._capture_loop), ("detect", self._process_loop)):
+                thread = self._threads.get(kind)
+                if thread is None or not thread.is_alive():
+                    thread = threading.Thread(target=loop, name=f"camera-{self.camera_id}-{kind}", daemon=True)
+                    self._threads[kind] = thread
+                    thread.start()
+            self._cond.notify_all()
+
+    def unsubscribe(self):
+        with self._cond:
+            self.subscribers = max(0, self.subscribers - 1)
+            STREAM_SUBSCRIBERS.set(self.subscribers, camera=self.camera_id)
+
+    def _open(self):
+        if self._capture is None:
+            self._capture = cv2.VideoCapture(self.source)
+            self._interval = self._file_interval() if self._capture.isOpened() else None
+        return self._capture.isOpened()
+
+    def _release(self):
+        """Close the source so the next _open really reconnects (or restarts a video file)."""
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+    def _file_interval(self):
+        """Seconds per frame for video files (played back in real time), else None."""
+        if not isinstance(self.source, str) or not os.path.isfile(self.source):
+            return None
+        fps = self._capture.get(cv2.CAP_PROP_FPS)
+        return 1.0 / fps if fps and fps > 0 else None
+
+    def _capture_loop(self):
+        next_due, failures, frames_since_open = 0.0, 0, 0
+        while True:
+            with self._cond:
+                if self.subscribers == 0:
+                    # ✅ Nobody watching: free the source and stop reading until a client subscribes
+                    self._release()
+                    while self.subscribers == 0:
+                        self._cond.wait()
+                    next_due, failures = 0.0, 0
+
+            if failures:
+                time.sleep(min(RECONNECT_MAX_DELAY, RECONNECT_DELAY * 2 ** (failures - 1)))
+
+            if self._capture is None:
+                frames_since_open = 0
+            if not self._open():
+                failures += 1
+                logger.error("❌ Could not open camera %s (%s), retrying", self.camera_id, self.source,
+                             extra={"sample": f"camera_open_{self.camera_id}"})
+                self._release()
+                continue
+
+            if self._interval:
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_due = max(next_due, time.monotonic() - self._interval) + self._interval
+
+            success, frame = self._capture.read()
+            if not success:
+                self._release()
+                if self._interval and frames_since_open:
+                    logger.debug("🔁 Camera %s reached the end of %s, looping", self.camera_id, self.source)
+                    continue
+                failures += 1
+                logger.warning("⚠️ Camera %s stopped delivering frames, reconnecting", self.camera_id,
+                               extra={"sample": f"camera_read_{self.camera_id}"})
+                continue
+            failures = 0
+            frames_since_open += 1
+
+            self._capture_rate.tick()
+            CAMERA_FRAMES.inc(camera=self.camera_id, stage="captured")
+            with self._cond:
+                self.captured += 1
+                if self._raw_seq > self._processed_seq:
+                    # ❌ Detection is behind: the previous frame is replaced before it was processed
+                    self.dropped += 1
+                    CAMERA_FRAMES.inc(camera=self.camera_id, stage="dropped")
+                self._raw, self._raw_seq = frame, self._raw_seq + 1
+                self._cond.notify_all()
+
+    def _process_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._raw_seq > self._processed_seq)
+                raw, self._processed_seq = self._raw, self._raw_seq
+                self._raw = None
+
+            frame = self.process(raw)
+            self._process_rate.tick()
+            CAMERA_FRAMES.inc(camera=self.camera_id, stage="processed")
+            with self._cond:
+                self.processed += 1
+                self.frame = frame
+                self.seq += 1
+                self._cond.notify_all()
+
+    def process(self, frame):
+        """Per-frame work done once for all clients."""
+        if self._detector is None:
+            self._detector = new_detector()  # Own cascade per camera: detection loops run in parallel
+        return draw_faces(frame, self._detector)  # Detect faces
+
+    def stats(self):
+        capture_fps, process_fps = self._capture_rate.fps, self._process_rate.fps
+        CAMERA_FPS.set(round(capture_fps, 2), camera=self.camera_id, stage="captured")
+        CAMERA_FPS.set(round(process_fps, 2), camera=self.camera_id, stage="processed")
+        with self._cond:
+            return {
+                "camera": self.camera_id,
+                "source": str(self.source),
+                "running": any(thread.is_alive() for thread in self._threads.values()),
+                "subscribers": self.subscribers,
+                "capture_fps": round(capture_fps, 2),
+                "process_fps": round(process_fps, 2),
+                "captured": self.captured,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "drop_rate": round(self.dropped / self.captured, 4) if self.captured else 0.0,
+            }
+
+    def wait_frame(self, after_seq, timeout=5.0):
+        """Block until a frame newer than `after_seq` is available; returns (seq, frame) or (seq, None)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > after_seq, timeout=timeout)
+            if self.seq > after_seq:
+                return self.seq, self.frame
+            return self.seq, None
+
+    def encode(self, seq, frame, width, quality):
+        """JPEG for `frame` at `width` and `quality`, shared by clients asking for the same settings."""
+        key = (width, quality)
+        with self._encode_lock:
+            if self._encoded_seq != seq:
+                self._encoded, self._encoded_seq = {}, seq
+            cached = self._encoded.get(key)
+            if cached is not None:
+                STREAM_FRAMES.inc(camera=self.camera_id, result="shared")
+                return cached
+
+            height, full_width = frame.shape[:2]
+            if width and 0 < width < full_width:
+                size = (width, max(1, int(height * width / full_width)))
+                frame = cv2.resize(frame, size, dst=self._resize_buffers.get(size), interpolation=cv2.INTER_AREA)
+                self._resize_buffers[size] = frame
+
+            with timed("jpeg_encode"):
+                _, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+            jpeg = encoded.tobytes()
+            self._encoded[key] = jpeg
+            STREAM_FRAMES.inc(camera=self.camera_id, result="encoded")
+        return jpeg
+
+
+class AdaptiveRate:
+    """
+    Per-client frame rate, width and JPEG quality, starting at the client's caps.
+    When sending a frame takes longer than the frame interval (the client or its uplink
+    is the bottleneck) it steps down quality, then fps, then resolution; it recovers
+    the same way once sends are consistently fast again.
+    """
+
+    def __init__(self, max_fps=DEFAULT_FPS, max_width=None, max_quality=DEFAULT_QUALITY, adaptive=True):
+        self.max_fps = max(MIN_FPS, max_fps)
+        self.max_width = max(MIN_WIDTH, max_width) if max_width else None  # 0 or missing: full width
+        self.max_quality = min(100, max(MIN_QUALITY, max_quality))
+        self.adaptive = adaptive
+        self.fps = self.max_fps
+        self.width = self.max_width
+        self.quality = self.max_quality
+        self._fast_sends = 0
+
+    @property
+    def interval(self):
+        return 1.0 / self.fps
+
+    def update(self, send_seconds, frame_width):
+        """Adjust settings from how long the last frame took to hand to the client."""
+        if not self.adaptive:
+            return
+        if send_seconds > self.interval:
+            self._fast_sends = 0
+            if self.quality > MIN_QUALITY:
+                self.quality = max(MIN_QUALITY, self.quality - 10)
+            elif self.fps > MIN_FPS:
+                self.fps = max(MIN_FPS, self.fps // 2)
+            else:
+                current = self.width or frame_width
+                self.width = max(MIN_WIDTH, int(current * 0.75))
+        elif send_seconds < self.interval / 4:
+            self._fast_sends += 1
+            if self._fast_sends >= 2 * self.fps:  # About two seconds of headroom
+                self._fast_sends = 0
+                max_width = self.max_width or frame_width
+                if self.width is not None and self.width < max_width:
+                    self.width = min(max_width, int(self.width / 0.75))
+                elif self.fps < self.max_fps:
+                    self.fps = min(self.max_fps, self.fps * 2)
+                elif self.quality < self.max_quality:
+                    self.quality = min(self.max_quality, self.quality + 10)
+
+
+def mjpeg_frames(stream, rate):
+    """Generator of multipart MJPEG parts for one client."""
+    stream.subscribe()
+    try:
+        last_seq, next_due, last_frame_at = 0, 0.0, time.monotonic()
+        while True:
+            # ✅ Respect the client's frame rate: wait instead of encoding frames it would drop
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            skipped_seq = last_seq
+            last_seq, frame = stream.wait_frame(last_seq)
+            if frame is None:
+                if time.monotonic() - last_frame_at > STALL_TIMEOUT:
+                    break  # Source down for a while (the reader keeps reconnecting); let the client retry
+                continue
+            last_frame_at = time.monotonic()
+            if last_seq - skipped_seq > 1:
+                STREAM_FRAMES.inc(last_seq - skipped_seq - 1, camera=stream.camera_id, result="skipped")
+            next_due = time.monotonic() + rate.interval
+
+            jpeg = stream.encode(last_seq, frame, rate.width, rate.quality)
+            sent_at = time.perf_counter()
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+            rate.update(time.perf_counter() - sent_at, frame.shape[1])
+    finally:
+        stream.unsubscribe()
+
+
+def parse_sources(spec):
+    """{camera_id: source} from "id=source,id=source"; bare entries use their position as id."""
+    sources = {}
+    for index, entry in enumerate(part.strip() for part in spec.split(",")):
+        if not entry:
+            continue
+        camera_id, sep, source = entry.partition("=")
+        if not sep:
+            camera_id, source = str(index), entry
+        source = source.strip()
+        sources[camera_id.strip()] = int(source) if source.isdigit() else source
+    return sources
+
+
+CAMERAS = {camera_id: CameraStream(camera_id, source) for camera_id, source in parse_sources(CAMERA_SOURCES).items()}
+
+
+def get_camera(camera_id=None):
+    """Camera stream by id (the first configured camera when None), or None if unknown."""
+    if camera_id is None:
+        return next(iter(CAMERAS.values()), None)
+    return CAMERAS.get(camera_id)
@@ -0,0 +1,355 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from .image_utils import TRAINING_DIR, clear_faces, enrollment_faces, load_face_hashes, next_image_path, save_face
+from .logger import get_logger
+from .metrics import counter, gauge
+
+logger = get_logger(__name__)
+
+# Session state is kept here (one JSON file per session) so a session survives dropped connections and restarts
+SESSION_DIR = os.environ.get("ATTENAI_ENROLLMENT_SESSION_DIR", "EnrollmentSessions")
+SESSION_TTL = float(os.environ.get("ATTENAI_ENROLLMENT_SESSION_TTL", "1800"))  # Idle seconds before a session is discarded
+MIN_FACES = int(os.environ.get("ATTENAI_ENROLLMENT_MIN_FACES", "10"))  # Distinct crops needed to close a session
+MAX_FACES = 100
+
+ENROLLMENT_FRAMES = counter(
+    "attenai_enrollment_session_frames_total", "Frames pushed to enrollment sessions.", ("result",)
+)
+ENROLLMENT_SESSIONS = counter(
+    "attenai_enrollment_sessions_total", "Enrollment sessions by outcome.", ("result",)
+)
+OPEN_SESSIONS = gauge("attenai_enrollment_sessions_open", "Open enrollment sessions loaded in this process.")
+
+
+class SessionError(Exception):
+    """A request that doesn't fit the session's state; carries the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class EnrollmentSession:
+    """
+    One user's enrollment: frames are pushed one at a time (each with a sequence number),
+    and faces are cropped, deduplicated and saved as they arrive. The state is written
+    after every frame, so a client that lost its connection asks for `next_seq` and carries on;
+    a frame pushed twice is acknowledged without being processed again.
+    Crops wait in the session's own folder and only move to TrainingImage/<uid>/ on close,
+    so training never picks up an unfinished enrollment.
+    """
+
+    def __init__(self, state, directory):
+        self.state = state
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.version = None  # (inode, mtime) of the state file this copy was read from or written to
+
+    @property
+    def session_id(self):
+        return self.state["session_id"]
+
+    @property
+    def user_folder(self):
+        return os.path.join(TRAINING_DIR, self.state["uid"])
+
+    @property
+    def pending_folder(self):
+        return os.path.join(self.directory, self.session_id)
+
+    def progress(self):
+        state = self.state
+        return {
+            "session_id": state["session_id"],
+            "uid": state["uid"],
+            "status": state["status"],
+            "next_seq": state["next_seq"],
+            "frames": state["frames"],
+            "frames_without_face": state["frames_without_face"],
+            "saved": len(state["saved_paths"]),
+            "duplicates_dropped": state["dropped"],
+            "min_faces": state["min_faces"],
+            "max_faces": state["max_faces"],
+            "ready": len(state["saved_paths"]) >= state["min_faces"],  # Enough to close; the client may stop capturing
+            "full": len(state["saved_paths"]) >= state["max_faces"],
+        }
+
+    def push(self, seq, img):
+        """Detect, crop and save the faces in frame `seq`; returns the progress plus the faces accepted from it."""
+        state = self.state
+        if state["status"] != "open":
+            raise SessionError(f"Session is {state['status']}.", 409)
+        if seq is None:
+            seq = state["next_seq"]
+        if seq < state["next_seq"]:
+            ENROLLMENT_FRAMES.inc(result="repeat")
+            return {**self.progress(), "seq": seq, "accepted": 0, "repeat": True}
+        if seq > state["next_seq"]:
+            raise SessionError(f"Expected frame {state['next_seq']}, got {seq}.", 409)
+
+        accepted = 0
+        if img is not None and len(state["saved_paths"]) < state["max_faces"]:
+            faces = enrollment_faces(img)
+            if not faces:
+                state["frames_without_face"] += 1
+            os.makedirs(self.pending_folder, exist_ok=True)
+            kept_hashes = state["hashes"]
+            for face in faces:
+                img_path, state["next_index"] = save_face(
+                    self.pending_folder, state["uid"], face, kept_hashes, state["next_index"]
+                )
+                if img_path is None:
+                    state["dropped"] += 1
+                    continue
+                state["saved_paths"].append(img_path)
+                accepted += 1
+                if len(state["saved_paths"]) >= state["max_faces"]:
+                    break
+
+        state["frames"] += 1
+        state["next_seq"] = seq + 1
+        ENROLLMENT_FRAMES.inc(result="accepted" if accepted else "no_face" if img is not None else "undecodable")
+        return {**self.progress(), "seq": seq, "accepted": accepted}
+
+    def commit_faces(self):
+        """Move the pending crops into TrainingImage/<uid>/ (replacing the user's crops unless retraining)."""
+        state = self.state
+        os.makedirs(self.user_folder, exist_ok=True)
+        if not state["retrain"] and not state.get("committed"):
+            clear_faces(self.user_folder)
+        index = 1
+        committed = []
+        for pending_path in state["saved_paths"]:
+            if os.path.dirname(pending_path) != self.pending_folder:
+                committed.append(pending_path)  # Moved by an earlier close that failed afterwards
+                continue
+            img_path, index = next_image_path(self.user_folder, state["uid"], index)
+            try:
+                os.replace(pending_path, img_path)
+            except FileNotFoundError:
+                continue
+            committed.append(img_path)
+        state["saved_paths"] = committed
+        state["committed"] = True
+        shutil.rmtree(self.pending_folder, ignore_errors=True)
+
+
+class EnrollmentSessions:
+    """Open sessions, loaded from SESSION_DIR on first use so they resume after a restart."""
+
+    def __init__(self, directory=SESSION_DIR, ttl=SESSION_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _update_gauge(self):
+        OPEN_SESSIONS.set(sum(1 for session in self._sessions.values() if session.state["status"] == "open"))
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def _save(self, session):
+        """Write the session state atomically."""
+        session.state["updated_at"] = time.time()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(session.state, file)
+        os.replace(tmp_path, self._path(session.session_id))
+        session.version = self._version(session.session_id)
+
+    def _version(self, session_id):
+        stat = os.stat(self._path(session_id))
+        return stat.st_ino, stat.st_mtime_ns  # Every save replaces the file, so the inode changes even on coarse clocks
+
+    def _load(self, session_id):
+        """A fresh copy of the session from its state file; None if there is none."""
+        try:
+            version = self._version(session_id)
+            with open(self._path(session_id), "r", encoding="utf-8") as file:
+                session = EnrollmentSession(json.load(file), self.directory)
+        except (OSError, ValueError):
+            return None
+        session.version = version
+        return session
+
+    def _refresh(self, session):
+        """
+        Re-read the state file if another process wrote it since this copy was loaded.
+        Returns False (and marks the session discarded) if the file is gone. Call with `session.lock` held.
+        """
+        try:
+            version = self._version(session.session_id)
+        except FileNotFoundError:
+            session.state["status"] = "discarded"
+            self._forget(session)
+            return False
+        if version != session.version:
+            fresh = self._load(session.session_id)
+            if fresh is None:
+                return False
+            session.state, session.version = fresh.state, fresh.version
+        return True
+
+    def _forget(self, session):
+        with self._lock:
+            if self._sessions.get(session.session_id) is session:
+                del self._sessions[session.session_id]
+            self._update_gauge()
+
+    def _discard(self, session, status):
+        """End a session for good (`status` is the terminal state); the crops still pending go too."""
+        session.state["status"] = status  # A push or close waiting on the lock now sees the session is gone
+        shutil.rmtree(session.pending_folder, ignore_errors=True)
+        try:
+            os.remove(self._path(session.session_id))
+        except FileNotFoundError:
+            pass
+        self._forget(session)
+
+    def _expire_if_idle(self, session, now=None):
+        """Discard `session` if it has been idle for longer than the TTL; returns whether it was."""
+        with session.lock:
+            if (now or time.time()) - session.state["updated_at"] <= self.ttl:
+                return False
+            self._discard(session, "expired")
+        ENROLLMENT_SESSIONS.inc(result="expired")
+        return True
+
+    def expire(self):
+        """Discard sessions idle for longer than the TTL, with their pending crops."""
+        if not os.path.isdir(self.directory):
+            return 0
+        expired = 0
+        now = time.time()
+        names = os.listdir(self.directory)
+        for filename in names:
+            session_id, ext = os.path.splitext(filename)
+            if ext == ".json":
+                session = self._lookup(session_id)
+                if session is not None and self._expire_if_idle(session, now):
+                    expired += 1
+            elif not ext and f"{filename}.json" not in names:
+                # Crops left behind by a session whose state is already gone
+                shutil.rmtree(os.path.join(self.directory, filename), ignore_errors=True)
+        if expired:
+            logger.info("🧹 Discarded %d idle enrollment sessions", expired)
+        return expired
+
+    def open(self, uid, name, retrain=False, min_faces=MIN_FACES, max_faces=MAX_FACES):
+        os.makedirs(self.directory, exist_ok=True)
+        self.expire()
+
+        user_folder = os.path.join(TRAINING_DIR, uid)
+        state = {
+            "session_id": uuid.uuid4().hex,
+            "uid": uid,
+            "name": name,
+            "retrain": retrain,
+            "status": "open",
+            "min_faces": min_faces,
+            "max_faces": max_faces,
+            "next_seq": 0,
+            "frames": 0,
+            "frames_without_face": 0,
+            "dropped": 0,
+            "saved_paths": [],
+            "next_index": 1,
+            # Retraining also skips faces the user already has on disk
+            "hashes": load_face_hashes(user_folder) if retrain and os.path.isdir(user_folder) else [],
+            "created_at": time.time(),
+        }
+        session = EnrollmentSession(state, self.directory)
+        with self._lock:
+            self._save(session)
+            self._sessions[session.session_id] = session
+            self._update_gauge()
+        ENROLLMENT_SESSIONS.inc(result="opened")
+        logger.info("📸 Enrollment session %s opened for %s", session.session_id, uid)
+        return session
+
+    def _lookup(self, session_id):
+        """The session with its state as on disk (loaded, or re-read if another process changed it); None if unknown."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            session = self._load(session_id)
+            if session is None:
+                return None
+            with self._lock:
+                session = self._sessions.setdefault(session_id, session)
+                self._update_gauge()
+        with session.lock:
+            if not self._refresh(session):
+                return None
+        return session
+
+    def get(self, session_id):
+        """The session, or None if it is unknown, discarded, or has been idle past the TTL."""
+        if not session_id.isalnum():
+            return None
+        session = self._lookup(session_id)
+        if session is None or self._expire_if_idle(session):
+            return None
+        return session
+
+    def push(self, session, seq, img):
+        with session.lock:
+            if session.state["status"] == "open" and not self._refresh(session):
+                raise SessionError("Session was discarded.", 404)
+            result = session.push(seq, img)
+            if not result.get("repeat"):
+                self._save(session)
+            return result
+
+    def close(self, session, finish):
+        """
+        Complete the session with `finish(state)` (register and train) once enough faces are saved.
+        Closing twice returns the first result, so a client can retry a close that timed out.
+        """
+        with session.lock:
+            if session.state["status"] == "open" and not self._refresh(session):
+                raise SessionError("Session was discarded.", 404)
+            state = session.state
+            if state["status"] == "closed":
+                return state["result"]
+            if state["status"] != "open":
+                raise SessionError(f"Session is {state['status']}.", 409)
+            if len(state["saved_paths"]) < state["min_faces"]:
+                raise SessionError(
+                    f"Only {len(state['saved_paths'])} distinct faces saved, {state['min_faces']} needed. Keep capturing."
+                )
+            session.commit_faces()
+            self._save(session)
+            state["result"] = finish(state)
+            state["status"] = "closed"
+            self._save(session)
+        with self._lock:
+            self._update_gauge()
+        ENROLLMENT_SESSIONS.inc(result="closed")
+        logger.info("✅ Enrollment session %s closed with %d faces", session.session_id, len(state["saved_paths"]))
+        return state["result"]
+
+    def abort(self, session):
+        """Discard the session; an open one loses its pending crops, a closed one keeps what it trained on."""
+        with session.lock:
+            self._discard(session, "aborted")
+        ENROLLMENT_SESSIONS.inc(result="aborted")
+
+
+_sessions = None
+_sessions_lock = threading.Lock()
+
+
+def get_enrollment_sessions():
+    """Process-wide session store."""
+    global _sessions
+    with _sessions_lock:
+        if _sessions is None:
+            _sessions = EnrollmentSessions()
+        return _sessions
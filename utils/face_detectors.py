@@ -0,0 +1,120 @@
+import os
+import threading
+import cv2
+import numpy as np
+from .file_utils import get_haarcascade_path
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Face detector engine: "haar" (default) or "yunet"
+FACE_DETECTOR = os.environ.get("ATTENAI_FACE_DETECTOR", "haar").lower()
+YUNET_MODEL_PATH = os.environ.get(
+    "ATTENAI_YUNET_MODEL", os.path.join("models", "face_detection_yunet_2023mar.onnx")
+)
+# Not vendored; `python -m tools.fetch_yunet_model` downloads it to YUNET_MODEL_PATH from an opencv_zoo
+# commit and keeps it only if its SHA-256 matches. Both are still to be pinned (looked up where GitHub is reachable);
+# until then the tool needs --commit and --sha256.
+YUNET_MODEL_COMMIT = None
+YUNET_MODEL_SHA256 = None
+YUNET_MODEL_URL = (
+    "https://github.com/opencv/opencv_zoo/raw/{commit}/models/face_detection_yunet/face_detection_yunet_2023mar.onnx"
+)
+YUNET_SCORE_THRESHOLD = float(os.environ.get("ATTENAI_YUNET_SCORE_THRESHOLD", "0.8"))
+YUNET_NMS_THRESHOLD = 0.3
+
+
+def _to_rects(faces, min_size=0, max_size=None):
+    """Nx4 int array of (x, y, w, h) within the size limits."""
+    rects = np.asarray(faces, dtype=np.int32).reshape(-1, 4)
+    keep = (rects[:, 2] >= min_size) & (rects[:, 3] >= min_size)
+    if max_size:
+        keep &= (rects[:, 2] <= max_size) & (rects[:, 3] <= max_size)
+    return rects[keep]
+
+
+class HaarDetector:
+    """OpenCV Haar cascade (the original detector). Expects grayscale input."""
+
+    name = "haar"
+    color = False  # Callers pass the grayscale image they already have
+
+    def __init__(self, scale_factor=1.05, min_neighbors=5, cascade_path=None):
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.cascade = cv2.CascadeClassifier(cascade_path or get_haarcascade_path())
+
+    def detect(self, image, min_size=40, max_size=None):
+        """Faces as an Nx4 array of (x, y, w, h)."""
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        faces = self.cascade.detectMultiScale(
+            image,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=(min_size, min_size),
+            maxSize=(max_size, max_size) if max_size else (0, 0),
+        )
+        return _to_rects(faces)
+
+
+class YuNetDetector:
+    """
+    OpenCV's CNN face detector (cv2.FaceDetectorYN, CPU). Handles off-angle faces better
+    than the cascade. Each thread gets its own network since the input size is per instance.
+    """
+
+    name = "yunet"
+    color = True  # Trained on BGR images
+
+    def __init__(self, model_path=YUNET_MODEL_PATH, score_threshold=YUNET_SCORE_THRESHOLD):
+        if not hasattr(cv2, "FaceDetectorYN"):
+            raise RuntimeError("cv2.FaceDetectorYN requires OpenCV >= 4.5.4")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"YuNet model not found: {model_path} (fetch it with `python -m tools.fetch_yunet_model`)"
+            )
+        self.model_path = model_path
+        self.score_threshold = score_threshold
+        self._local = threading.local()
+
+    def _net(self, width, height):
+        net = getattr(self._local, "net", None)
+        if net is None:
+            net = self._local.net = cv2.FaceDetectorYN.create(
+                self.model_path, "", (width, height), self.score_threshold, YUNET_NMS_THRESHOLD
+            )
+        net.setInputSize((width, height))
+        return net
+
+    def detect(self, image, min_size=40, max_size=None):
+        """Faces as an Nx4 array of (x, y, w, h), clipped to the image."""
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        height, width = image.shape[:2]
+        _, faces = self._net(width, height).detect(image)
+        if faces is None:
+            return _to_rects([])
+
+        boxes = faces[:, :4]
+        x0 = np.clip(boxes[:, 0], 0, width)
+        y0 = np.clip(boxes[:, 1], 0, height)
+        x1 = np.clip(boxes[:, 0] + boxes[:, 2], 0, width)
+        y1 = np.clip(boxes[:, 1] + boxes[:, 3], 0, height)
+        return _to_rects(np.stack([x0, y0, x1 - x0, y1 - y0], axis=1), min_size, max_size)
+
+
+DETECTORS = {"haar": HaarDetector, "yunet": YuNetDetector}
+
+
+def create_detector(name=None):
+    """Detector selected by `name` or ATTENAI_FACE_DETECTOR; falls back to Haar if YuNet can't load."""
+    name = (name or FACE_DETECTOR).lower()
+    if name not in DETECTORS:
+        logger.warning("⚠️ Unknown face detector %r (ATTENAI_FACE_DETECTOR), falling back to haar", name)
+        return HaarDetector()
+    try:
+        return DETECTORS[name]()
+    except (RuntimeError, FileNotFoundError, cv2.error) as e:
+        logger.warning("⚠️ Face detector %r was requested but is unavailable, falling back to haar: %s", name, e)
+        return HaarDetector()
@@ -1,15 +1,27 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
 
 # Define the path to the Firebase credentials file
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 FIREBASE_CRED_PATH = os.path.join(BASE_DIR, "config", "firebase_key.json")
 
-# Ensure Firebase is initialized only once
-if not firebase_admin._apps:
-    cred = credentials.Certificate(FIREBASE_CRED_PATH)
-    firebase_admin.initialize_app(cred)
+# "firebase" (default) or "local" for the in-memory stand-in used in load tests
+FIRESTORE_BACKEND = os.environ.get("ATTENAI_FIRESTORE", "firebase")
 
-# Get Firestore database instance
-db = firestore.client()
+if FIRESTORE_BACKEND == "local":
+    from .local_firestore import LocalFirestore
+
+    db = LocalFirestore.from_seed(
+        os.environ.get("ATTENAI_FIRESTORE_SEED"),
+        latency_ms=float(os.environ.get("ATTENAI_FIRESTORE_LATENCY_MS", "0")),
+    )
+else:
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    # Ensure Firebase is initialized only once
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(FIREBASE_CRED_PATH)
+        firebase_admin.initialize_app(cred)
+
+    # Get Firestore database instance
+    db = firestore.client()
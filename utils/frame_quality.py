@@ -0,0 +1,129 @@
+import os
+import cv2
+import numpy as np
+from .logger import get_logger
+from .metrics import counter
+
+logger = get_logger(__name__)
+
+# Per-endpoint gate mode: "reject" skips the frame, "flag" only reports it, "off" disables the gate
+QUALITY_MODES = {
+    "recognize": os.environ.get("ATTENAI_QUALITY_RECOGNIZE", "reject"),
+    "register": os.environ.get("ATTENAI_QUALITY_REGISTER", "reject"),
+    "video": os.environ.get("ATTENAI_QUALITY_VIDEO", "flag"),
+}
+
+# Thresholds, measured on the downsampled grayscale frame
+ANALYSIS_WIDTH = 160  # Frames are shrunk to this width before analysis
+MIN_SHARPNESS = float(os.environ.get("ATTENAI_QUALITY_MIN_SHARPNESS", "8.0"))  # Laplacian variance
+MIN_BRIGHTNESS = float(os.environ.get("ATTENAI_QUALITY_MIN_BRIGHTNESS", "40"))
+MAX_BRIGHTNESS = float(os.environ.get("ATTENAI_QUALITY_MAX_BRIGHTNESS", "220"))
+MAX_CLIPPED_FRACTION = float(os.environ.get("ATTENAI_QUALITY_MAX_CLIPPED", "0.5"))  # Share of near-black/white pixels
+MIN_FACE_SIZE = int(os.environ.get("ATTENAI_QUALITY_MIN_FACE_SIZE", "50"))  # Pixels, in the original frame
+
+QUALITY_FRAMES = counter(
+    "attenai_quality_frames_total", "Frames seen by the quality gate.", ("endpoint", "result")
+)
+QUALITY_REJECTIONS = counter(
+    "attenai_quality_rejections_total", "Quality problems found, by reason.", ("endpoint", "reason")
+)
+QUALITY_WORK_SAVED = counter(
+    "attenai_quality_work_saved_total", "Detection/prediction calls skipped by the quality gate.", ("endpoint", "work")
+)
+
+
+class FrameQuality:
+    """Result of a quality check on one frame."""
+
+    def __init__(self, sharpness, brightness, clipped, reasons, mode):
+        self.sharpness = sharpness
+        self.brightness = brightness
+        self.clipped = clipped
+        self.reasons = reasons
+        self.mode = mode
+
+    @property
+    def ok(self):
+        return not self.reasons
+
+    @property
+    def proceed(self):
+        """Whether expensive work should still run on this frame."""
+        return self.ok or self.mode != "reject"
+
+    def to_dict(self):
+        return {
+            "ok": self.ok,
+            "reasons": self.reasons,
+            "sharpness": round(self.sharpness, 2),
+            "brightness": round(self.brightness, 2),
+            "clipped": round(self.clipped, 3),
+        }
+
+
+def assess_frame(frame, mode="reject"):
+    """Measure sharpness, brightness and clipping on a downsampled grayscale copy of the frame."""
+    height, width = frame.shape[:2]
+    if width > ANALYSIS_WIDTH:
+        small = cv2.resize(frame, (ANALYSIS_WIDTH, max(1, int(height * ANALYSIS_WIDTH / width))),
+                           interpolation=cv2.INTER_AREA)
+    else:
+        small = frame
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    total = hist.sum() or 1.0
+    brightness = float(np.dot(hist, np.arange(256)) / total)
+    clipped = float((hist[:11].sum() + hist[245:].sum()) / total)
+
+    reasons = []
+    if sharpness < MIN_SHARPNESS:
+        reasons.append("blurry")
+    if brightness < MIN_BRIGHTNESS:
+        reasons.append("too_dark")
+    elif brightness > MAX_BRIGHTNESS:
+        reasons.append("overexposed")
+    if clipped > MAX_CLIPPED_FRACTION:
+        reasons.append("clipped")
+
+    return FrameQuality(sharpness, brightness, clipped, reasons, mode)
+
+
+def check_frame(frame, endpoint):
+    """
+    Run the quality gate configured for `endpoint`.
+    Returns a FrameQuality, or None when the gate is off for that endpoint.
+    """
+    mode = QUALITY_MODES.get(endpoint, "off")
+    if mode == "off":
+        return None
+
+    quality = assess_frame(frame, mode)
+    if quality.ok:
+        QUALITY_FRAMES.inc(endpoint=endpoint, result="passed")
+        return quality
+
+    for reason in quality.reasons:
+        QUALITY_REJECTIONS.inc(endpoint=endpoint, reason=reason)
+    if quality.proceed:
+        QUALITY_FRAMES.inc(endpoint=endpoint, result="flagged")
+    else:
+        QUALITY_FRAMES.inc(endpoint=endpoint, result="rejected")
+        QUALITY_WORK_SAVED.inc(endpoint=endpoint, work="detect")
+    logger.debug("⚠️ Poor %s frame (%s): %s", endpoint, mode, quality.to_dict(), extra={"sample": f"quality_{endpoint}"})
+    return quality
+
+
+def filter_faces(faces, endpoint):
+    """Drop detections too small to recognize reliably, counting the predictions saved."""
+    mode = QUALITY_MODES.get(endpoint, "off")
+    if mode != "reject":
+        return faces
+
+    kept = [face for face in faces if min(face[2], face[3]) >= MIN_FACE_SIZE]
+    skipped = len(faces) - len(kept)
+    if skipped:
+        QUALITY_REJECTIONS.inc(skipped, endpoint=endpoint, reason="face_too_small")
+        QUALITY_WORK_SAVED.inc(skipped, endpoint=endpoint, work="predict")
+    return kept
@@ -2,58 +2,161 @@ import cv2
 import numpy as np
 import base64
 import os
-from .file_utils import get_haarcascade_path
+from .metrics import timed, counter
+from .logger import get_logger
+from .frame_quality import check_frame, filter_faces
+from .face_detectors import create_detector
+from .model_utils import load_model_profile, normalize_face
 
-# Load the face detection model
-detector = cv2.CascadeClassifier(get_haarcascade_path())
+logger = get_logger(__name__)
+
+# Load the face detection model (ATTENAI_FACE_DETECTOR selects the engine)
+detector = create_detector()
 
 # Directory for storing training images
 TRAINING_DIR = "TrainingImage"
 
+# Crops whose difference hashes are within this many bits (of 64) of a kept crop are dropped
+DEDUP_MAX_DISTANCE = int(os.environ.get("ATTENAI_DEDUP_MAX_DISTANCE", "4"))
+
+ENROLLMENT_FACES = counter(
+    "attenai_enrollment_faces_total", "Face crops seen during enrollment.", ("result",)
+)
+
+
+def face_hash(face):
+    """64-bit difference hash of a grayscale face crop (robust to small shifts and lighting)."""
+    small = cv2.resize(face, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def is_near_duplicate(hash_value, kept_hashes, max_distance=DEDUP_MAX_DISTANCE):
+    """Whether `hash_value` is within `max_distance` bits of any already-kept crop."""
+    return any(hamming_distance(hash_value, kept) <= max_distance for kept in kept_hashes)
+
+
+def load_face_hashes(user_folder):
+    """Hash the crops already stored for a user, so retraining does not re-add the same faces."""
+    hashes = []
+    for filename in os.listdir(user_folder):
+        if filename.endswith(".jpg"):
+            face = cv2.imread(os.path.join(user_folder, filename), cv2.IMREAD_GRAYSCALE)
+            if face is not None:
+                hashes.append(face_hash(face))
+    return hashes
+
+
+def clear_faces(user_folder):
+    """Delete the crops stored for a user, so a new registration replaces them."""
+    for filename in os.listdir(user_folder):
+        if filename.endswith(".jpg"):
+            os.remove(os.path.join(user_folder, filename))
+
+
+def next_image_path(user_folder, user_id, index):
+    """First free `<uid>_<n>.jpg` path at or after `index`."""
+    while True:
+        img_path = os.path.join(user_folder, f"{user_id}_{index}.jpg")
+        if not os.path.exists(img_path):
+            return img_path, index
+        index += 1
+
+
+def decode_image(image_data):
+    """
+    BGR image from a `data:image/...;base64,` URL, bare base64, or raw JPEG/PNG bytes.
+    Returns None (and logs why) if it can't be decoded; shared by /recognize and /register.
+    """
+    try:
+        if isinstance(image_data, str):
+            with timed("b64_decode"):
+                image_data = base64.b64decode(image_data.split(",")[-1])
+        with timed("imdecode"):
+            img = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    except Exception as e:
+        logger.warning("❌ Error decoding image: %s", e, extra={"sample": "decode_error"})
+        return None
+    if img is None:
+        logger.warning("❌ Image data is not a decodable image", extra={"sample": "decode_error"})
+    return img
+
+
+def enrollment_faces(img):
+    """Equalized 300x300 face crops from one enrollment frame (none if the frame fails the quality gate)."""
+    # ✅ Skip blurry, dark or overexposed frames before running detection
+    quality = check_frame(img, "register")
+    if quality is not None and not quality.proceed:
+        return []
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+    # ✅ Apply histogram equalization
+    equalized = cv2.equalizeHist(gray)
+
+    with timed("detect"):
+        faces = detector.detect(img if detector.color else equalized, min_size=50)
+
+    return [cv2.resize(equalized[y:y+h, x:x+w], (300, 300)) for (x, y, w, h) in filter_faces(faces, "register")]
+
+
+def save_face(user_folder, user_id, face, kept_hashes, next_index):
+    """
+    Store a crop unless it nearly duplicates one in `kept_hashes` (updated in place).
+    Returns (saved path or None, next free index).
+    """
+    # ✅ Skip crops nearly identical to one already kept
+    hash_value = face_hash(face)
+    if is_near_duplicate(hash_value, kept_hashes):
+        ENROLLMENT_FACES.inc(result="duplicate")
+        return None, next_index
+    kept_hashes.append(hash_value)
+
+    # ✅ Save improved images
+    img_path, next_index = next_image_path(user_folder, user_id, next_index)
+    cv2.imwrite(img_path, face)
+    ENROLLMENT_FACES.inc(result="saved")
+    return img_path, next_index + 1
+
+
 def crop_and_save_faces(user_id, name, images, max_faces=100, retrain=False):
     """
     Crop faces, apply histogram equalization, and save for training.
     If retraining, appends new images instead of replacing old ones.
+    Near-duplicate crops (webcam bursts) are dropped so only distinct samples are kept.
+    Returns (saved_count, dropped_count).
     """
     os.makedirs(TRAINING_DIR, exist_ok=True)
     user_folder = os.path.join(TRAINING_DIR, user_id)
     os.makedirs(user_folder, exist_ok=True)
 
-    # ✅ Check existing images count
-    existing_images = len(os.listdir(user_folder)) if os.path.exists(user_folder) else 0
+    # ✅ A new registration replaces the user's crops; retraining keeps them and skips faces already stored
+    if not retrain:
+        clear_faces(user_folder)
+    existing_images = len(os.listdir(user_folder))
     saved_count = existing_images if retrain else 0  # If retraining, start from existing count
+    kept_hashes = load_face_hashes(user_folder) if retrain else []
+    dropped_count = 0
+    next_index = saved_count + 1
 
     for idx, img_data in enumerate(images):
         if saved_count >= max_faces:
             break
 
         try:
-            img_data = base64.b64decode(img_data.split(",")[1])
-            img_path = os.path.join(user_folder, f"{user_id}_{saved_count + 1}.jpg")
-
-            with open(img_path, "wb") as f:
-                f.write(img_data)
-
-            img = cv2.imread(img_path)
+            img = decode_image(img_data)
             if img is None:
                 continue
 
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-            # ✅ Apply histogram equalization
-            equalized = cv2.equalizeHist(gray)
-
-            faces = detector.detectMultiScale(equalized, scaleFactor=1.05, minNeighbors=5, minSize=(50, 50))
-
-            if len(faces) == 0:
-                continue
-
-            for (x, y, w, h) in faces:
-                face = equalized[y:y+h, x:x+w]
-
-                # ✅ Save improved images
-                resized_face = cv2.resize(face, (300, 300))
-                cv2.imwrite(img_path, resized_face)
+            for face in enrollment_faces(img):
+                img_path, next_index = save_face(user_folder, user_id, face, kept_hashes, next_index)
+                if img_path is None:
+                    dropped_count += 1
+                    continue
 
                 saved_count += 1
 
@@ -61,39 +164,44 @@ def crop_and_save_faces(user_id, name, images, max_faces=100, retrain=False):
                     break
 
         except Exception as e:
-            print(f"❌ Error processing image {idx + 1}: {e}")
+            logger.warning("❌ Error processing image %d: %s", idx + 1, e)
+
+    if dropped_count:
+        logger.info("🧹 Dropped %d near-duplicate crops for %s", dropped_count, user_id)
 
-    return saved_count
+    return saved_count, dropped_count
 
 
-def detect_faces(frame, recognizer):
+def detect_faces(frame, recognizer, endpoint="recognize", profile=None):
     """
     Detect and recognize faces with dynamic confidence adjustment.
+    Faces too small for a reliable prediction are skipped by the quality gate of `endpoint`.
+    Crops are normalized with the model's profile (read from its metadata when not given).
     """
     if not isinstance(frame, np.ndarray):
-        print("❌ Invalid frame format in detect_faces")
+        logger.warning("❌ Invalid frame format in detect_faces")
         return [], frame
 
+    profile = profile or load_model_profile()
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
-    faces = detector.detectMultiScale(
-        gray, scaleFactor=1.05, minNeighbors=5, minSize=(40, 40), maxSize=(400, 400)
-    )
+    with timed("detect"):
+        faces = detector.detect(frame if detector.color else gray, min_size=40, max_size=400)
 
     recognized_users = []
-    for (x, y, w, h) in faces:
-        face = gray[y:y+h, x:x+w]
-        face = cv2.resize(face, (300, 300))
+    for (x, y, w, h) in filter_faces(faces, endpoint):
+        face = normalize_face(gray[y:y+h, x:x+w], profile)
 
         try:
-            id, conf = recognizer.predict(face)
+            with timed("predict"):
+                id, conf = recognizer.predict(face)
 
             # ✅ Adjust confidence threshold dynamically
             distance_factor = 1 - (w / frame.shape[1])  # Approximate distance factor
-            threshold = 60 + (distance_factor * 20)  # Higher confidence needed for distant faces
+            threshold = profile["max_distance"] * (1 + distance_factor / 3)  # Higher confidence needed for distant faces
 
             if conf > threshold:
-                print(f"❌ Confidence too high ({conf}), skipping.")
+                logger.debug("❌ Confidence too high (%s), skipping.", conf, extra={"sample": "face_low_confidence"})
                 continue
 
             recognized_users.append({"uid": str(id), "confidence": round(conf, 2)})
@@ -105,17 +213,27 @@ def detect_faces(frame, recognizer):
                         cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
 
         except Exception as e:
-            print(f"❌ Error recognizing face: {e}")
+            logger.warning("❌ Error recognizing face: %s", e, extra={"sample": "face_predict_error"})
 
     return recognized_users, frame
 
 
-def draw_faces(frame):
+def new_detector():
+    """A separate detector, for loops that detect on their own thread (e.g. one per camera)."""
+    return create_detector()
+
+
+def draw_faces(frame, face_detector=None):
     """
     Detect faces and draw bounding boxes.
     """
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = detector.detectMultiScale(gray, scaleFactor=1.05, minNeighbors=5, minSize=(40, 40))
+    quality = check_frame(frame, "video")
+    if quality is not None and not quality.proceed:
+        return frame  # ❌ Poor frame, stream it without running detection
+
+    face_detector = face_detector or detector
+    image = frame if face_detector.color else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    faces = face_detector.detect(image, min_size=40)
 
     for (x, y, w, h) in faces:
         cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)  # Draw green box
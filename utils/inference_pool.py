@@ -0,0 +1,253 @@
+"""
+Pool of inference worker processes for /recognize.
+
+Each worker keeps a warmed Haar detector and LBPH recognizer (reloaded when the
+model or its metadata is replaced) and owns a shared-memory frame slot: the request thread
+copies the decoded frame into the slot and only sends its shape over a pipe, so
+frames are never pickled. Enable with ATTENAI_INFERENCE_WORKERS=<n>.
+"""
+import atexit
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from .logger import get_logger
+from .metrics import counter, gauge, histogram, merge_stages
+
+logger = get_logger(__name__)
+
+INFERENCE_WORKERS = int(os.environ.get("ATTENAI_INFERENCE_WORKERS", "0"))  # 0 = run on the request thread
+INFERENCE_TIMEOUT = float(os.environ.get("ATTENAI_INFERENCE_TIMEOUT", "10"))  # Seconds per frame
+INITIAL_SLOT_BYTES = 640 * 480 * 3  # Grown on demand for larger frames
+
+WORKER_REQUESTS = counter(
+    "attenai_inference_worker_requests_total", "Frames handled by inference workers.", ("worker", "result")
+)
+WORKER_SECONDS = histogram(
+    "attenai_inference_worker_seconds", "Round-trip latency of a frame through an inference worker.", ("worker",)
+)
+WORKER_WAIT_SECONDS = histogram(
+    "attenai_inference_wait_seconds", "Time spent waiting for an idle inference worker."
+)
+WORKERS_IDLE = gauge("attenai_inference_workers_idle", "Inference workers currently idle.")
+
+
+class InferenceError(Exception):
+    """Raised when a worker fails or times out on a frame."""
+
+
+def _worker_main(conn):
+    """Worker process loop: receive frame descriptors, run detection + prediction, reply."""
+    from .image_utils import detect_faces
+    from .metrics import collect_stages
+    from .model_utils import load_model_profile, load_recognizer, model_version
+
+    # ✅ Warm up: load the model before the first frame arrives
+    version = model_version()
+    recognizer, profile = load_recognizer(), load_model_profile()
+    shm = None
+
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        try:
+            # ✅ Reload the model and its profile when either was replaced by a retrain
+            current = model_version()
+            if current != version:
+                recognizer, profile, version = load_recognizer(), load_model_profile(), current
+            if recognizer is None:
+                conn.send({"error": "model_missing"})
+                continue
+
+            if shm is None or shm.name != message["shm"]:
+                if shm is not None:
+                    shm.close()
+                # Spawned workers share the parent's resource tracker, which unlinks the segment
+                shm = shared_memory.SharedMemory(name=message["shm"])
+
+            frame = np.ndarray(message["shape"], dtype=np.uint8, buffer=shm.buf)
+            with collect_stages() as timings:
+                recognized_users, _ = detect_faces(frame, recognizer, profile=profile)
+            conn.send({"users": recognized_users, "timings": timings})
+        except Exception as e:
+            conn.send({"error": str(e)})
+
+    if shm is not None:
+        shm.close()
+
+
+def _recognize_in_process(frame):
+    """Detect and recognize on the calling thread, as without a pool (used when a worker has died)."""
+    from .image_utils import detect_faces
+    from .model_utils import load_model_profile, load_recognizer
+
+    recognizer = load_recognizer()
+    if recognizer is None:
+        raise InferenceError("model_missing")
+    recognized_users, _ = detect_faces(frame, recognizer, profile=load_model_profile())
+    return recognized_users
+
+
+class _Worker:
+    """Parent-side handle: process, pipe, shared-memory slot and stats."""
+
+    def __init__(self, index, ctx):
+        self.index = index
+        self.ctx = ctx
+        self.shm = shared_memory.SharedMemory(create=True, size=INITIAL_SLOT_BYTES)
+        self.requests = 0
+        self.errors = 0
+        self.restarts = -1
+        self.last_latency = None
+        self.total_latency = 0.0
+        self.start()
+
+    def start(self):
+        self.conn, child_conn = self.ctx.Pipe()
+        self.process = self.ctx.Process(
+            target=_worker_main, args=(child_conn,), name=f"inference-{self.index}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.restarts += 1
+
+    def restart(self):
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+        self.start()
+
+    def ensure_capacity(self, nbytes):
+        if nbytes > self.shm.size:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+
+    def run(self, frame, timeout):
+        self.ensure_capacity(frame.nbytes)
+        np.ndarray(frame.shape, dtype=np.uint8, buffer=self.shm.buf)[...] = frame
+        self.conn.send({"shm": self.shm.name, "shape": frame.shape})
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"inference worker {self.index} timed out")
+        return self.conn.recv()
+
+    def stats(self):
+        return {
+            "worker": self.index,
+            "pid": self.process.pid,
+            "alive": self.process.is_alive(),
+            "requests": self.requests,
+            "errors": self.errors,
+            "restarts": self.restarts,
+            "last_latency_ms": round(self.last_latency * 1000, 2) if self.last_latency is not None else None,
+            "avg_latency_ms": round(self.total_latency / self.requests * 1000, 2) if self.requests else None,
+        }
+
+    def close(self):
+        try:
+            self.conn.send(None)
+            self.process.join(timeout=2)
+        except (OSError, EOFError):
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class InferencePool:
+    """Dispatch frames to idle workers; each worker handles one frame at a time."""
+
+    def __init__(self, size, timeout=INFERENCE_TIMEOUT):
+        ctx = mp.get_context("spawn")  # Don't fork the Flask process and its threads
+        self.timeout = timeout
+        self.workers = [_Worker(i, ctx) for i in range(size)]
+        self._idle = queue.Queue()
+        for worker in self.workers:
+            self._idle.put(worker)
+        WORKERS_IDLE.set(size)
+        logger.info("🧠 Started %d inference workers", size)
+
+    def recognize(self, frame):
+        """Detect and recognize faces in a BGR frame; returns the recognized users list."""
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        wait_start = time.perf_counter()
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise InferenceError("No inference worker available")
+        WORKER_WAIT_SECONDS.observe(time.perf_counter() - wait_start)
+        WORKERS_IDLE.dec()
+
+        start = time.perf_counter()
+        worker_died = False
+        try:
+            reply = worker.run(frame, self.timeout)
+            elapsed = time.perf_counter() - start
+            worker.requests += 1
+            worker.last_latency = elapsed
+            worker.total_latency += elapsed
+            if "error" in reply:
+                worker.errors += 1
+        except TimeoutError as e:
+            worker.errors += 1
+            WORKER_REQUESTS.inc(worker=worker.index, result="failed")
+            logger.error("❌ Inference worker %d failed (%s), restarting it", worker.index, e)
+            worker.restart()
+            raise InferenceError(str(e))
+        except (OSError, EOFError) as e:
+            # ❌ Broken pipe: the worker process is gone. Restart it and answer this frame here instead of failing it
+            worker.errors += 1
+            WORKER_REQUESTS.inc(worker=worker.index, result="fallback")
+            logger.error("❌ Inference worker %d died (%s), restarting it and recognizing in-process", worker.index, e)
+            worker.restart()
+            worker_died = True
+        finally:
+            self._idle.put(worker)
+            WORKERS_IDLE.inc()
+
+        if worker_died:
+            return _recognize_in_process(frame)
+
+        WORKER_SECONDS.observe(elapsed, worker=worker.index)
+        if "error" in reply:
+            WORKER_REQUESTS.inc(worker=worker.index, result="error")
+            raise InferenceError(reply["error"])
+
+        WORKER_REQUESTS.inc(worker=worker.index, result="ok")
+        merge_stages(reply["timings"])
+        return reply["users"]
+
+    def stats(self):
+        return {
+            "size": len(self.workers),
+            "idle": self._idle.qsize(),
+            "workers": [worker.stats() for worker in self.workers],
+        }
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_inference_pool():
+    """
+    The process-wide pool, started on first use; None when ATTENAI_INFERENCE_WORKERS is 0.
+    Never started from a child process: spawned workers re-import the server's main module.
+    """
+    global _pool
+    if INFERENCE_WORKERS <= 0 or mp.parent_process() is not None:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = InferencePool(INFERENCE_WORKERS)
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,97 @@
+import csv
+import os
+import re
+import threading
+from .logger import get_logger
+from .metrics import timed
+
+logger = get_logger(__name__)
+
+DATE_PATTERN = re.compile(rb"\d{4}-\d{2}-\d{2}")
+
+
+class LedgerIndex:
+    """
+    Byte ranges of the attendance CSV per record date (the date part of timeRecorded).
+    The ledger is append-only and roughly chronological, so a date range maps to one
+    contiguous span of the file; rows appended since the last lookup are indexed on demand.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._spans = {}  # "YYYY-MM-DD" -> [first row offset, end of last row]
+        self._offset = 0  # Bytes of the file already indexed
+        self._inode = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Index rows appended since the last call; start over if the file was replaced or truncated."""
+        with self._lock:
+            if not os.path.exists(self.path):
+                self._spans, self._offset, self._inode = {}, 0, None
+                return
+            stat = os.stat(self.path)
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                self._spans, self._offset, self._inode = {}, 0, stat.st_ino
+            if stat.st_size == self._offset:
+                return
+
+            with timed("ledger_index"), open(self.path, "rb") as file:
+                file.seek(self._offset)
+                position = self._offset
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break  # ❌ Partial row still being written; index it next time
+                    start, position = position, position + len(line)
+                    date = line.rstrip(b"\r\n").rsplit(b",", 1)[-1][:10]
+                    if not DATE_PATTERN.fullmatch(date):
+                        continue  # Header or malformed row
+                    span = self._spans.get(date.decode())
+                    if span is None:
+                        self._spans[date.decode()] = [start, position]
+                    else:
+                        span[0] = min(span[0], start)
+                        span[1] = max(span[1], position)
+                self._offset = position
+
+    def span(self, start_date=None, end_date=None):
+        """(start, end) byte range holding every row dated start_date..end_date, or None."""
+        self.refresh()
+        with self._lock:
+            spans = [
+                span for date, span in self._spans.items()
+                if (start_date is None or date >= start_date) and (end_date is None or date <= end_date)
+            ]
+        if not spans:
+            return None
+        return min(span[0] for span in spans), max(span[1] for span in spans)
+
+    def rows(self, start_date=None, end_date=None, module=None):
+        """Yield ledger rows (lists) dated start_date..end_date, reading only the indexed span."""
+        span = self.span(start_date, end_date)
+        if span is None:
+            return
+        start, end = span
+        with open(self.path, "rb") as file:
+            file.seek(start)
+            position = start
+            for line in file:
+                position += len(line)
+                if position > end:
+                    break
+                row = next(csv.reader([line.decode("utf-8")]), None)
+                if not row or len(row) < 5:
+                    continue
+                date = row[4][:10]
+                if start_date is not None and date < start_date:
+                    continue
+                if end_date is not None and date > end_date:
+                    continue
+                if module is not None and row[2] != module:
+                    continue
+                yield row
+
+    def dates(self):
+        self.refresh()
+        with self._lock:
+            return sorted(self._spans)
@@ -0,0 +1,131 @@
+"""
+In-memory stand-in for the Firestore client used by `utils.firebase_config.db`.
+Only implements what the routes use: collection().stream()/get()/add()/where().
+Enable with ATTENAI_FIRESTORE=local (optionally seeded from ATTENAI_FIRESTORE_SEED).
+"""
+import itertools
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "in": lambda a, b: a in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+def _normalize(value):
+    """Compare timestamps like Firestore does: naive datetimes are UTC, aware ones are converted."""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class LocalDocument:
+    """Snapshot of a stored document."""
+
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = dict(data)
+
+    @property
+    def exists(self):
+        return True
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class LocalQuery:
+    """Chain of `where` filters evaluated against a collection snapshot."""
+
+    def __init__(self, collection, filters=()):
+        self._collection = collection
+        self._filters = tuple(filters)
+
+    def where(self, field, op, value):
+        if op not in _OPERATORS:
+            raise ValueError(f"Unsupported operator: {op}")
+        return LocalQuery(self._collection, self._filters + ((field, op, value),))
+
+    def _matches(self, data):
+        for field, op, value in self._filters:
+            if field not in data:
+                return False
+            try:
+                if not _OPERATORS[op](_normalize(data[field]), _normalize(value)):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def stream(self):
+        self._collection._simulate_latency()
+        return iter([doc for doc in self._collection._snapshot() if self._matches(doc.to_dict())])
+
+    def get(self):
+        return list(self.stream())
+
+
+class LocalCollection(LocalQuery):
+    """A named collection of documents, shared across threads."""
+
+    def __init__(self, db, name):
+        super().__init__(self)
+        self._db = db
+        self.name = name
+        self._docs = {}
+
+    def _simulate_latency(self):
+        self._db._simulate_latency()
+
+    def _snapshot(self):
+        with self._db._lock:
+            return [LocalDocument(doc_id, data) for doc_id, data in self._docs.items()]
+
+    def add(self, data):
+        self._simulate_latency()
+        with self._db._lock:
+            doc_id = f"local-{next(self._db._ids)}"
+            self._docs[doc_id] = dict(data)
+        return datetime.now(timezone.utc), LocalDocument(doc_id, data)
+
+
+class LocalFirestore:
+    """Minimal thread-safe in-memory Firestore client."""
+
+    def __init__(self, latency_ms=0):
+        self.latency_ms = latency_ms
+        self._collections = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def from_seed(cls, seed_path=None, latency_ms=0):
+        """Create a client, optionally pre-populated from {"collection": [doc, ...]} JSON."""
+        db = cls(latency_ms=latency_ms)
+        if seed_path:
+            with open(seed_path, "r", encoding="utf-8") as file:
+                seed = json.load(file)
+            for name, docs in seed.items():
+                for doc in docs:
+                    db.collection(name)._docs[f"seed-{next(db._ids)}"] = dict(doc)
+        return db
+
+    def _simulate_latency(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def collection(self, name):
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = LocalCollection(self, name)
+            return collection
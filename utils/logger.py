@@ -0,0 +1,119 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from .metrics import counter
+
+# Logging configuration (environment overrides)
+LOG_LEVEL = os.environ.get("ATTENAI_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("ATTENAI_LOG_FORMAT", "json")  # "json" or "text"
+LOG_QUEUE_SIZE = int(os.environ.get("ATTENAI_LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_EVERY = int(os.environ.get("ATTENAI_LOG_SAMPLE_EVERY", "20"))  # keep 1 in N sampled records
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sample"}
+
+LOG_RECORDS_DROPPED = counter(
+    "attenai_log_records_dropped_total", "Log records dropped because the log queue was full."
+)
+
+_setup_lock = threading.Lock()
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as a single JSON line, including any `extra=` fields."""
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep 1 in `every` records that carry a `sample` key (e.g. per-face messages).
+    The first record of each key always passes; kept records report how many were dropped.
+    """
+
+    def __init__(self, every=LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.every = max(1, every)
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record, "sample", None)
+        if key is None or self.every == 1:
+            return True
+        with self._lock:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+        if seen % self.every:
+            return False
+        if seen:
+            record.sampled_out = self.every - 1
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hand records to the listener thread without formatting them on the caller's thread.
+    Records are dropped (and counted) instead of blocking when the queue is full.
+    """
+
+    def prepare(self, record):
+        # Formatting happens in the listener thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+def setup_logging():
+    """Route all logging through a bounded queue drained by a background thread (idempotent)."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        stream_handler = logging.StreamHandler()
+        if LOG_FORMAT == "json":
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        queue_handler = NonBlockingQueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter())
+
+        root = logging.getLogger()
+        root.handlers = [queue_handler]
+        root.setLevel(LOG_LEVEL)
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    """Return a logger for `name`, configuring the async logging pipeline on first use."""
+    setup_logging()
+    return logging.getLogger(name)
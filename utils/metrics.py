@@ -0,0 +1,266 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+
+# Latency buckets (seconds) shared by every histogram
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Send a Server-Timing header on every response (otherwise only when the client asks for it)
+SERVER_TIMING_ALWAYS = os.environ.get("ATTENAI_SERVER_TIMING", "0") == "1"
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, values):
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down (queue depth, pool size...)."""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, optionally split by labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                labels = _format_labels(self.labelnames + ("le",), key + (repr(float(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames + ("le",), key + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series[-2]}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Registry:
+    """Holds every metric of the process and renders the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames=labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames=labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames=labelnames, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Shared pipeline metrics
+STAGE_SECONDS = REGISTRY.histogram(
+    "attenai_stage_duration_seconds", "Time spent in each processing stage.", ("stage",)
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "attenai_http_requests_total", "HTTP requests handled.", ("endpoint", "method", "status")
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "attenai_http_request_duration_seconds", "End-to-end HTTP request latency.", ("endpoint",)
+)
+
+
+def counter(name, documentation, labelnames=()):
+    """Get or create a counter in the process registry."""
+    return REGISTRY.counter(name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()):
+    """Get or create a gauge in the process registry."""
+    return REGISTRY.gauge(name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Get or create a histogram in the process registry."""
+    return REGISTRY.histogram(name, documentation, labelnames, buckets)
+
+
+_collectors = threading.local()
+
+
+@contextmanager
+def collect_stages():
+    """Collect {stage: (seconds, count)} recorded by this thread, e.g. to ship them out of a worker process."""
+    timings = {}
+    previous = getattr(_collectors, "timings", None)
+    _collectors.timings = timings
+    try:
+        yield timings
+    finally:
+        _collectors.timings = previous
+
+
+def _accumulate(timings, stage, seconds, count=1):
+    total, seen = timings.get(stage, (0.0, 0))
+    timings[stage] = (total + seconds, seen + count)
+
+
+def record_stage(stage, seconds):
+    """Record a finished stage in the stage histogram and the current request's timings."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    collector = getattr(_collectors, "timings", None)
+    if collector is not None:
+        _accumulate(collector, stage, seconds)
+    if has_request_context():
+        _accumulate(g.setdefault("stage_timings", {}), stage, seconds)
+
+
+def merge_stages(timings):
+    """Record stage timings measured elsewhere (another process) as if they ran here."""
+    for stage, (total, count) in timings.items():
+        for _ in range(count):
+            STAGE_SECONDS.observe(total / count, stage=stage)
+        if has_request_context():
+            _accumulate(g.setdefault("stage_timings", {}), stage, total, count)
+
+
+@contextmanager
+def timed(stage):
+    """Time the enclosed block as one span of `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def render_latest():
+    """Render all metrics in the Prometheus text exposition format."""
+    return REGISTRY.render()
+
+
+def server_timing_header(timings):
+    """Build a Server-Timing header value from {stage: (seconds, count)}."""
+    parts = []
+    for stage, (total, count) in timings.items():
+        entry = f"{stage};dur={total * 1000:.2f}"
+        if count > 1:
+            entry += f';desc="x{count}"'
+        parts.append(entry)
+    return ", ".join(parts)
+
+
+def _wants_server_timing():
+    return (
+        SERVER_TIMING_ALWAYS
+        or request.args.get("timing") == "1"
+        or request.headers.get("X-Server-Timing") == "1"
+    )
+
+
+def init_app(app):
+    """Attach request latency tracking and the optional Server-Timing header to the app."""
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_started = time.perf_counter()
+        g.stage_timings = {}
+
+    @app.after_request
+    def _finish_request_timer(response):
+        started = g.get("request_started")
+        if started is None:
+            return response
+
+        elapsed = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        HTTP_SECONDS.observe(elapsed, endpoint=endpoint)
+
+        if _wants_server_timing():
+            timings = dict(g.get("stage_timings", {}))
+            timings["total"] = (elapsed, 1)
+            response.headers["Server-Timing"] = server_timing_header(timings)
+        return response
@@ -1,67 +1,251 @@
+import json
 import os
+import tempfile
+from datetime import datetime
 import cv2
 import numpy as np
 from PIL import Image
 import re
+from .metrics import timed
+from .logger import get_logger
+
+logger = get_logger(__name__)
 
 # Paths
 TRAINING_DIR = "TrainingImage"
 MODEL_DIR = "TrainedModel"
 MODEL_PATH = os.path.join(MODEL_DIR, "Trainner.yml")
+METADATA_PATH = os.path.join(MODEL_DIR, "Trainner.json")  # Profile the model was trained with
+
+# Face normalization profiles: LBPH input size, LBP radius/neighbors, histogram grid and
+# distance thresholds (distances scale with the profile, so each has its own; calibrated
+# with tools/evaluate_profiles.py against the default profile's genuine distances).
+# Histogram length per sample is grid_x * grid_y * 2^neighbors; LBP cost grows with size².
+FACE_PROFILES = {
+    "default": {"size": 300, "radius": 1, "neighbors": 8, "grid_x": 8, "grid_y": 8, "threshold": 50, "max_distance": 60},
+    "balanced": {"size": 150, "radius": 1, "neighbors": 8, "grid_x": 8, "grid_y": 8, "threshold": 100, "max_distance": 120},
+    "fast": {"size": 100, "radius": 1, "neighbors": 8, "grid_x": 6, "grid_y": 6, "threshold": 60, "max_distance": 72},
+    "compact": {"size": 100, "radius": 1, "neighbors": 4, "grid_x": 8, "grid_y": 8, "threshold": 40, "max_distance": 48},
+}
+FACE_PROFILE = os.environ.get("ATTENAI_FACE_PROFILE", "default")  # Used when training
+
+# Sample histograms kept per user after training (0 keeps every enrollment crop)
+MODEL_PROTOTYPES = int(os.environ.get("ATTENAI_MODEL_PROTOTYPES", "0"))
 
 # Ensure model directory exists
 os.makedirs(MODEL_DIR, exist_ok=True)
 
-def get_images_and_labels(path):
+def get_profile(name=None):
+    """Normalization profile by name (ATTENAI_FACE_PROFILE when None), with its name included."""
+    name = name or FACE_PROFILE
+    if name not in FACE_PROFILES:
+        logger.warning("⚠️ Unknown face profile %r, using default", name)
+        name = "default"
+    return {"name": name, **FACE_PROFILES[name]}
+
+
+def normalize_face(face, profile):
+    """Resize a grayscale face crop to the profile's LBPH input size."""
+    size = profile["size"]
+    if face.shape[0] == size and face.shape[1] == size:
+        return face
+    return cv2.resize(face, (size, size), interpolation=cv2.INTER_AREA)
+
+
+def create_recognizer(profile):
+    recognizer = cv2.face.LBPHFaceRecognizer_create(
+        radius=profile["radius"], neighbors=profile["neighbors"], grid_x=profile["grid_x"], grid_y=profile["grid_y"]
+    )
+    recognizer.setThreshold(profile["threshold"])  # Lower threshold = stricter recognition
+    return recognizer
+
+
+def training_image_paths(path):
+    """(image path, uid) for `<name>_<uid>_<n>.jpg` files and crops saved under `<uid>/` folders."""
+    entries = []
+    for root, _, files in os.walk(path):
+        folder = os.path.basename(root) if root != path else None
+        for filename in sorted(files):
+            if not filename.endswith(".jpg"):
+                continue
+            match = re.search(r"_(\d+)_", filename)  # Extract numeric UID
+            if match:
+                entries.append((os.path.join(root, filename), int(match.group(1))))
+            elif folder and folder.isdigit():
+                entries.append((os.path.join(root, filename), int(folder)))  # Enrollment crops: <uid>/<uid>_<n>.jpg
+            else:
+                logger.debug("❌ Skipping invalid filename: %s", filename, extra={"sample": "train_invalid_filename"})
+    return entries
+
+
+def get_images_and_labels(path, profile=None):
     """
-    Extract face images and IDs from the training directory.
+    Extract face images and IDs from the training directory, normalized to the profile's size.
     Supports dynamic UID extraction and handles missing/corrupt images.
     """
-    image_paths = [os.path.join(path, f) for f in os.listdir(path) if f.endswith(".jpg")]
+    profile = profile or get_profile()
     faces, ids = [], []
 
-    for image_path in image_paths:
+    for image_path, user_id in training_image_paths(path):
         try:
             img = Image.open(image_path).convert('L')  # Convert to grayscale
-            image_np = np.array(img, 'uint8')
-
-            # ✅ Extract UID correctly using regex
-            filename = os.path.basename(image_path)
-            match = re.search(r"_(\d+)_", filename)  # Extract numeric UID
-            if match:
-                user_id = int(match.group(1))  # Convert to int
-                faces.append(image_np)
-                ids.append(user_id)
-            else:
-                print(f"❌ Skipping invalid filename: {filename}")
-
+            faces.append(normalize_face(np.array(img, 'uint8'), profile))
+            ids.append(user_id)
         except Exception as e:
-            print(f"❌ Error processing image {image_path}: {e}")
+            logger.warning("❌ Error processing image %s: %s", image_path, e)
 
     return faces, ids
 
-def train_recognizer():
+def chi_square_distances(histograms):
+    """Pairwise chi-square distances between rows, as LBPH compares histograms (HISTCMP_CHISQR_ALT)."""
+    histograms = np.asarray(histograms, dtype=np.float32)
+    count = len(histograms)
+    distances = np.zeros((count, count), dtype=np.float64)
+    for i in range(count - 1):
+        diff = histograms[i + 1:] - histograms[i]
+        total = histograms[i + 1:] + histograms[i]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            row = np.where(total > 0, 2 * diff * diff / total, 0).sum(axis=1)
+        distances[i, i + 1:] = row
+        distances[i + 1:, i] = row
+    return distances
+
+
+def k_medoids(distances, k, iterations=20):
+    """
+    Indices of `k` distinct medoids for a square distance matrix (farthest-first start, then
+    assign/update). Every medoid stays in its own cluster, so none is picked twice.
+    """
+    count = len(distances)
+    if count <= k:
+        return list(range(count))
+
+    medoids = [int(distances.sum(axis=1).argmin())]  # Most central sample first
+    while len(medoids) < k:
+        nearest = distances[:, medoids].min(axis=1)
+        nearest[medoids] = -1  # Never re-pick a medoid, even when the rest are at distance 0
+        medoids.append(int(nearest.argmax()))
+
+    for _ in range(iterations):
+        assignment = distances[:, medoids].argmin(axis=1)
+        assignment[medoids] = np.arange(len(medoids))  # Ties between equal samples can't empty a cluster
+        updated = []
+        for cluster, medoid in enumerate(medoids):
+            members = np.flatnonzero(assignment == cluster)
+            if len(members) == 0:
+                updated.append(medoid)
+                continue
+            updated.append(int(members[distances[np.ix_(members, members)].sum(axis=1).argmin()]))
+        if sorted(updated) == sorted(medoids):
+            break
+        medoids = updated
+    return sorted(medoids)
+
+
+def select_prototypes(recognizer, k):
+    """Indices of the training samples to keep: `k` medoid histograms per user."""
+    histograms = recognizer.getHistograms()
+    labels = recognizer.getLabels().ravel()
+    keep = []
+    for label in np.unique(labels):
+        indices = np.flatnonzero(labels == label)
+        user_histograms = np.vstack([histograms[i].ravel() for i in indices])
+        # ✅ Identical samples (burst enrollment) count once, so they can't take several prototype slots
+        _, first = np.unique(user_histograms, axis=0, return_index=True)
+        first = np.sort(first)
+        medoids = k_medoids(chi_square_distances(user_histograms[first]), k)
+        keep.extend(int(indices[first[i]]) for i in medoids)
+    return sorted(keep)
+
+
+def train_recognizer(profile=None, prototypes=None):
     """
     Train the face recognition model using LBPHFaceRecognizer.
     Ensures model updates without losing previous training.
+    The normalization profile is saved next to the model so recognition uses the same one.
+    With `prototypes` (ATTENAI_MODEL_PROTOTYPES) > 0 each user keeps only that many representative samples.
     """
-    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    profile = get_profile(profile)
+    prototypes = MODEL_PROTOTYPES if prototypes is None else prototypes
+    recognizer = create_recognizer(profile)
 
-    # ✅ Set optimized parameters for better accuracy
-    recognizer.setThreshold(50)  # Lower threshold = better recognition
-
-    faces, ids = get_images_and_labels(TRAINING_DIR)
+    with timed("train_load_images"):
+        faces, ids = get_images_and_labels(TRAINING_DIR, profile)
 
     if not faces or not ids:
-        print("❌ No valid training images found.")
+        logger.error("❌ No valid training images found.")
         return
 
     # Train the recognizer
-    recognizer.train(faces, np.array(ids))
+    with timed("train_fit"):
+        recognizer.train(faces, np.array(ids))
+
+    # ✅ Compact: retrain on each user's medoid crops so prediction compares fewer histograms
+    samples = len(faces)
+    if prototypes > 0:
+        with timed("train_compact"):
+            keep = select_prototypes(recognizer, prototypes)
+            recognizer = create_recognizer(profile)
+            recognizer.train([faces[i] for i in keep], np.array([ids[i] for i in keep]))
+        samples = len(keep)
+        logger.info("🗜️ Compacted model from %d to %d samples (%d per user)", len(faces), samples, prototypes)
+
+    # Save the trained model: written aside, then swapped in after its metadata so readers never
+    # see a half-written model or the new model with the old profile
+    with timed("train_save"):
+        fd, tmp_path = tempfile.mkstemp(dir=MODEL_DIR, suffix=".yml")
+        os.close(fd)
+        try:
+            recognizer.save(tmp_path)
+            save_model_metadata({
+                "profile": profile,
+                "samples": samples,
+                "training_images": len(faces),
+                "prototypes": prototypes,
+                "users": len(set(ids)),
+                "trained_at": datetime.now().isoformat(timespec="seconds"),
+            })
+            _publish(tmp_path, MODEL_PATH)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    logger.info("✅ Model trained with the %s profile and saved at %s", profile["name"], MODEL_PATH)
+
+
+def _publish(tmp_path, path):
+    """Atomically move a finished temp file into place, world-readable like the files it replaces."""
+    os.chmod(tmp_path, 0o644)  # mkstemp creates files as 0600
+    os.replace(tmp_path, path)
+
+
+def save_model_metadata(metadata):
+    """Write the model metadata atomically (read by every process that loads the model)."""
+    fd, tmp_path = tempfile.mkstemp(dir=MODEL_DIR, suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as file:
+        json.dump(metadata, file, indent=2)
+    _publish(tmp_path, METADATA_PATH)
+
+
+def model_version():
+    """Changes whenever the model or its metadata file is replaced (inode and mtime of both)."""
+    version = []
+    for path in (MODEL_PATH, METADATA_PATH):
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_ino, stat.st_mtime_ns))
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
 
-    # Save the trained model
-    recognizer.save(MODEL_PATH)
-    print(f"✅ Model trained and saved at {MODEL_PATH}")
+def load_model_profile():
+    """Profile the current model was trained with; models from before profiles existed use `default`."""
+    try:
+        with open(METADATA_PATH, "r", encoding="utf-8") as file:
+            return {**FACE_PROFILES["default"], **json.load(file)["profile"]}
+    except (OSError, ValueError, KeyError):
+        return get_profile("default")
 
 def load_recognizer():
     """
@@ -69,10 +253,11 @@ def load_recognizer():
     Ensures it exists before loading.
     """
     if not os.path.exists(MODEL_PATH):
-        print("❌ No trained model found! Train the model first.")
+        logger.warning("❌ No trained model found! Train the model first.")
         return None
 
     recognizer = cv2.face.LBPHFaceRecognizer_create()
     recognizer.read(MODEL_PATH)
-    print("✅ Model loaded successfully.")
+    recognizer.setThreshold(load_model_profile()["threshold"])
+    logger.debug("✅ Model loaded successfully.")
     return recognizer
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from .metrics import counter
+
+# Retried /recognize uploads are answered from this cache
+RESPONSE_CACHE_TTL = float(os.environ.get("ATTENAI_RESPONSE_CACHE_TTL", "120"))  # Seconds; 0 turns the cache off
+RESPONSE_CACHE_SIZE = int(os.environ.get("ATTENAI_RESPONSE_CACHE_SIZE", "512"))  # Entries
+
+CACHE_REQUESTS = counter(
+    "attenai_response_cache_requests_total", "Idempotent response cache lookups.", ("cache", "result")
+)
+
+
+def payload_key(payload):
+    """Stable key for a request payload (e.g. the base64 image string)."""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+class KeyReusedError(Exception):
+    """A key (e.g. an Idempotency-Key) was reused with a different payload."""
+
+
+class ResponseCache:
+    """
+    Bounded TTL + LRU cache of computed responses.
+    Concurrent requests for the same key wait for the first one instead of recomputing.
+    An entry can carry a payload fingerprint; a lookup with a different one raises KeyReusedError.
+    A TTL of 0 (or less) disables it: every request is computed, even concurrent identical ones.
+    """
+
+    def __init__(self, name, maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, fingerprint)
+        self._inflight = {}  # key -> (threading.Event, fingerprint)
+        self._lock = threading.Lock()
+
+    def _get_locked(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._get_locked(key, time.monotonic())
+        return entry[1] if entry else None
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def put(self, key, value, fingerprint=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value, fingerprint)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _check_fingerprint(self, stored, fingerprint):
+        if stored != fingerprint:
+            CACHE_REQUESTS.inc(cache=self.name, result="mismatch")
+            raise KeyReusedError("key was already used with a different payload")
+
+    def get_or_compute(self, key, compute, cacheable=lambda value: True, fingerprint=None):
+        """
+        Return (value, hit). Only values accepted by `cacheable` are stored.
+        With `fingerprint` (a hash of the payload), reusing `key` for a different payload,
+        cached or still in flight, raises KeyReusedError instead of returning the other result.
+        """
+        if not self.enabled:
+            CACHE_REQUESTS.inc(cache=self.name, result="bypass")
+            return compute(), False
+
+        while True:
+            with self._lock:
+                entry = self._get_locked(key, time.monotonic())
+                if entry is not None:
+                    self._check_fingerprint(entry[2], fingerprint)
+                    CACHE_REQUESTS.inc(cache=self.name, result="hit")
+                    return entry[1], True
+                inflight = self._inflight.get(key)
+                if inflight is None:
+                    event = threading.Event()
+                    self._inflight[key] = (event, fingerprint)
+                    break
+                event, inflight_fingerprint = inflight
+                self._check_fingerprint(inflight_fingerprint, fingerprint)
+            # Same payload is being processed right now: wait for its result
+            CACHE_REQUESTS.inc(cache=self.name, result="wait")
+            event.wait(timeout=self.ttl)
+
+        CACHE_REQUESTS.inc(cache=self.name, result="miss")
+        try:
+            value = compute()
+            if cacheable(value):
+                self.put(key, value, fingerprint)
+            return value, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,233 @@
+import csv
+import io
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from .logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+logger = get_logger(__name__)
+
+ROSTER_PATH = os.path.join("StudentDetails", "StudentDetails.csv")
+ROSTER_HEADER = ["ID", "Name", "RegistrationTime"]
+
+# Rewrite the file once superseded rows outnumber live ones by this factor
+COMPACT_FACTOR = 2
+
+
+class Roster:
+    """
+    Student roster backed by an append-only CSV with an in-memory uid index.
+    Re-registering a uid appends a new row; the latest row wins on load (upsert).
+    The file is compacted with an atomic replace once superseded rows pile up.
+    """
+
+    def __init__(self, path=ROSTER_PATH):
+        self.path = path
+        self._index = {}  # uid -> {"ID", "Name", "RegistrationTime"}
+        self._rows = 0  # Data rows currently on disk
+        self._offset = 0  # Bytes of the file already indexed
+        self._inode = None  # Detects the file being replaced by a compaction
+        self._unparsed = []  # Raw lines that aren't roster rows; kept through compactions
+        self._lock = threading.Lock()
+        self._load()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared with other processes, held while appending or compacting."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _load(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._file_lock():
+            if not os.path.exists(self.path):
+                self._write_atomic([])
+                return
+
+            # No writer can be mid-row while we hold the lock, so a last row without a newline
+            # (hand-edited or exported files) is complete: index it and terminate it for later appends
+            if self._read_new_rows(final=True):
+                with open(self.path, "ab") as file:
+                    file.write(b"\n")
+                self._offset += 1
+
+    def _index_chunk(self, chunk):
+        """Index the CSV rows in `chunk` (bytes); lines that aren't roster rows go to `_unparsed`."""
+        try:
+            texts = [chunk.decode("utf-8")]
+        except UnicodeDecodeError:
+            texts = []
+            for line in chunk.splitlines():
+                try:
+                    texts.append(line.decode("utf-8"))
+                except UnicodeDecodeError:
+                    self._keep_unparsed(line)
+
+        for text in texts:
+            for row in csv.reader(io.StringIO(text, newline="")):
+                if not row or row == ROSTER_HEADER:
+                    continue
+                if len(row) < 2 or not row[0].strip():
+                    buffer = io.StringIO()
+                    csv.writer(buffer).writerow(row)
+                    self._keep_unparsed(buffer.getvalue().rstrip("\r\n").encode("utf-8"))
+                    continue
+                uid = row[0].strip()
+                self._index[uid] = {
+                    "ID": uid,
+                    "Name": row[1],
+                    "RegistrationTime": row[2] if len(row) > 2 else "",
+                }
+                self._rows += 1
+
+    def _keep_unparsed(self, line):
+        logger.warning("⚠️ Skipping unreadable roster row in %s: %r", self.path, line[:80],
+                       extra={"sample": "roster_unparsed"})
+        self._unparsed.append(line)
+
+    def _read_new_rows(self, final=False):
+        """
+        Index rows appended since the last read (also picks up other processes' writes).
+        Returns True if `final` consumed a last row that has no trailing newline.
+        """
+        with open(self.path, "rb") as file:
+            self._inode = os.fstat(file.fileno()).st_ino
+            file.seek(self._offset)
+            data = file.read()
+
+        # Only consume complete lines; without the file lock a partial row may still be being written
+        complete = data.rfind(b"\n") + 1
+        self._offset += complete
+        self._index_chunk(data[:complete])
+
+        tail = data[complete:]
+        if final and tail.strip():
+            self._offset += len(tail)
+            self._index_chunk(tail)
+            return True
+        return False
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            # Compacted by another process: re-index from scratch
+            self._index, self._rows, self._offset, self._unparsed = {}, 0, 0, []
+            self._read_new_rows()
+        elif stat.st_size > self._offset:
+            self._read_new_rows()
+
+    def _write_atomic(self, records):
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(prefix=".roster-", suffix=".csv", dir=directory)
+        try:
+            with os.fdopen(fd, "w", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                writer.writerow(ROSTER_HEADER)
+                for record in records:
+                    writer.writerow([record["ID"], record["Name"], record["RegistrationTime"]])
+                file.flush()
+                for line in self._unparsed:  # Never drop rows we couldn't classify
+                    file.buffer.write(line + b"\n")
+                file.buffer.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        stat = os.stat(self.path)
+        self._rows = len(records)
+        self._offset = stat.st_size
+        self._inode = stat.st_ino
+
+    def upsert(self, uid, name, registration_time=None):
+        """Add or update a student with a single appended row."""
+        uid = str(uid).strip()
+        record = {
+            "ID": uid,
+            "Name": name,
+            "RegistrationTime": str(registration_time or datetime.now()),
+        }
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow([record["ID"], record["Name"], record["RegistrationTime"]])
+        line = buffer.getvalue().encode("utf-8")
+
+        with self._lock, self._file_lock():
+            self._refresh()
+            # One O_APPEND write per row keeps concurrent appends from interleaving
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            try:
+                os.write(fd, line)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            # ✅ Index from the file rather than assuming the appended bytes follow our offset
+            self._refresh()
+
+            if self._rows > COMPACT_FACTOR * len(self._index):
+                self._compact_locked()
+        return record
+
+    def _compact_locked(self):
+        self._refresh()  # Keep rows other processes appended since our last read
+        self._write_atomic(sorted(self._index.values(), key=lambda r: r["ID"]))
+        logger.info("🗜️ Compacted roster to %d students", len(self._index))
+
+    def compact(self):
+        """Rewrite the file with one row per student (atomic replace)."""
+        with self._lock, self._file_lock():
+            self._compact_locked()
+
+    def get(self, uid):
+        """Roster record for `uid`, or None."""
+        with self._lock:
+            self._refresh()
+            return self._index.get(str(uid).strip())
+
+    def get_name(self, uid, default=None):
+        record = self.get(uid)
+        return record["Name"] if record else default
+
+    def all(self):
+        with self._lock:
+            self._refresh()
+            return list(self._index.values())
+
+    def __contains__(self, uid):
+        return self.get(uid) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._index)
+
+
+_roster = None
+_roster_lock = threading.Lock()
+
+
+def get_roster():
+    """Process-wide roster instance, loaded on first use."""
+    global _roster
+    with _roster_lock:
+        if _roster is None:
+            _roster = Roster()
+        return _roster
@@ -0,0 +1,82 @@
+import base64
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from flask import request
+from .logger import get_logger
+from .metrics import counter
+
+logger = get_logger(__name__)
+
+# Set ATTENAI_CAPTURE_DIR to record incoming payloads for offline replay
+CAPTURE_DIR = os.environ.get("ATTENAI_CAPTURE_DIR")
+CAPTURE_PATHS = tuple(
+    p.strip() for p in os.environ.get("ATTENAI_CAPTURE_PATHS", "/recognize,/register").split(",") if p.strip()
+)
+# Enrollment session URLs carry session ids that won't exist when the capture is replayed
+CAPTURE_EXCLUDE = tuple(
+    p.strip() for p in os.environ.get("ATTENAI_CAPTURE_EXCLUDE", "/register/sessions").split(",") if p.strip()
+)
+
+CAPTURED_REQUESTS = counter(
+    "attenai_captured_requests_total", "Requests recorded by traffic capture mode.", ("path",)
+)
+
+
+class TrafficRecorder:
+    """Append captured requests as JSON lines from a background writer thread."""
+
+    def __init__(self, capture_dir):
+        os.makedirs(capture_dir, exist_ok=True)
+        filename = f"capture-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl"
+        self.path = os.path.join(capture_dir, filename)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write_loop, name="traffic-capture", daemon=True)
+        self._thread.start()
+
+    def record(self, method, path, body, content_type):
+        """Queue one request; `body` is bytes, stored as text or, if it isn't UTF-8 (e.g. a JPEG), as base64."""
+        entry = {
+            "ts": time.time(),
+            "method": method,
+            "path": path,
+            "content_type": content_type,
+        }
+        try:
+            entry["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["body"] = base64.b64encode(body).decode("ascii")
+            entry["body_encoding"] = "base64"
+        self._queue.put(entry)
+
+    def _write_loop(self):
+        with open(self.path, "a", encoding="utf-8") as file:
+            while True:
+                entry = self._queue.get()
+                file.write(json.dumps(entry) + "\n")
+                if self._queue.empty():
+                    file.flush()
+
+
+def init_app(app, capture_dir=CAPTURE_DIR):
+    """Record POST bodies sent to the capture paths when a capture directory is configured."""
+    if not capture_dir:
+        return None
+
+    recorder = TrafficRecorder(capture_dir)
+    logger.info("📼 Capturing %s traffic to %s", ", ".join(CAPTURE_PATHS), recorder.path)
+
+    @app.before_request
+    def _capture_request():
+        if request.method != "POST" or not request.path.startswith(CAPTURE_PATHS):
+            return
+        if CAPTURE_EXCLUDE and request.path.startswith(CAPTURE_EXCLUDE):
+            return
+        # get_data() caches the body, so request.json still works in the route
+        recorder.record(request.method, request.full_path.rstrip("?"), request.get_data(), request.content_type)
+        CAPTURED_REQUESTS.inc(path=request.path)
+
+    return recorder